@@ -1,11 +1,13 @@
 import asyncio
 import argparse
+import json
 import sys
 from typing import Dict, List, Optional, Any
 
 from app.utils.logging import get_logger
 from app.utils.migrations import MigrationManager
 from app.utils.backup import DatabaseBackup
+from app.utils.index_advisor import build_index_report
 from app.config.database import connect_to_mongodb, close_mongodb_connection
 from app.config.settings import get_settings
 
@@ -130,6 +132,43 @@ async def run_backup_command(args: argparse.Namespace) -> int:
         # Close database connection
         await close_mongodb_connection()
 
+async def run_indexes_command(args: argparse.Namespace) -> int:
+    """Report on index usage"""
+    try:
+        # Connect to database
+        await connect_to_mongodb()
+        
+        report = await build_index_report(args.profile_limit)
+        
+        if args.json:
+            print(json.dumps(report, default=str, indent=2))
+            return 0
+        
+        for title, kind in (("Unused indexes", "unused"), ("Redundant indexes", "redundant"),
+                            ("Low-selectivity indexes", "low_selectivity")):
+            print(f"{title}: {len(report[kind])}")
+            for index in report[kind]:
+                detail = f" (covered by {index['covered_by']})" if "covered_by" in index else ""
+                print(f"  {index['collection']}.{index['index']} - {index['size_mb']} MB{detail}")
+        
+        print(f"Recommended indexes: {len(report['recommended'])}")
+        for shape in report["recommended"]:
+            keys = ", ".join(f"{field}: {direction}" for field, direction in shape["keys"])
+            print(f"  {shape['collection']} {{{keys}}} - {shape['queries']} queries, {shape['total_ms']} ms, "
+                  f"{shape['docs_examined']} docs examined for {shape['returned']} returned")
+        
+        print(f"Space held by removable indexes: {report['removable_index_mb']} MB")
+        return 0
+        
+    except Exception as e:
+        logger.error(f"Error building index report: {str(e)}", exc_info=True)
+        print(f"Error: {str(e)}")
+        return 1
+        
+    finally:
+        # Close database connection
+        await close_mongodb_connection()
+
 def create_parser() -> argparse.ArgumentParser:
     """Create command-line argument parser"""
     parser = argparse.ArgumentParser(description="SkillSwap CLI")
@@ -153,6 +192,11 @@ def create_parser() -> argparse.ArgumentParser:
     backup_group.add_argument("--list", action="store_true", help="List available backups")
     backup_group.add_argument("--cleanup", action="store_true", help="Clean up old backups")
     
+    # Indexes command
+    indexes_parser = subparsers.add_parser("indexes", help="Index usage report")
+    indexes_parser.add_argument("--profile-limit", type=int, default=1000, help="Profiled queries to analyze")
+    indexes_parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    
     return parser
 
 def main():
@@ -169,6 +213,8 @@ def main():
         exit_code = asyncio.run(run_migrations_command(args))
     elif args.command == "backup":
         exit_code = asyncio.run(run_backup_command(args))
+    elif args.command == "indexes":
+        exit_code = asyncio.run(run_indexes_command(args))
     else:
         print(f"Unknown command: {args.command}")
         exit_code = 1
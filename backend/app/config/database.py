@@ -3,6 +3,8 @@ import time
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo.server_api import ServerApi
 from app.config.settings import get_settings
+from app.utils.db_monitoring import command_metrics, pool_metrics, get_pool_stats, get_command_stats
+from app.utils.db_guard import db_guard
 
 settings = get_settings()
 
@@ -24,7 +26,8 @@ async def connect_to_mongodb():
             maxPoolSize=50,  # Increased connection pool for production
             minPoolSize=10,  # Minimum connections to maintain
             maxIdleTimeMS=60000,  # Close idle connections after 1 minute
-            waitQueueTimeoutMS=10000  # Wait time for connection from pool
+            waitQueueTimeoutMS=settings.mongodb_wait_queue_timeout_ms,  # Fail fast instead of queueing under overload
+            event_listeners=[command_metrics, pool_metrics]  # Latency and pool telemetry
         )
         
         # Send a ping to confirm a successful connection
@@ -34,11 +37,6 @@ async def connect_to_mongodb():
         # Get database instance
         db = client[settings.mongodb_db_name]
         
-        # Initialize indexes on startup if in production
-        if settings.environment == "production":
-            from app.utils.db_indexes import create_indexes
-            await create_indexes()
-        
         # Return client for testing purposes
         return client
     except Exception as e:
@@ -67,10 +65,13 @@ def get_connection_stats():
     """Get database connection pool statistics"""
     if not client:
         return None
-        
+    
+    max_pool_size = client.options.pool_options.max_pool_size
     return {
-        "maxPoolSize": client.options.pool_options.max_pool_size,
+        "maxPoolSize": max_pool_size,
         "minPoolSize": client.options.pool_options.min_pool_size,
-        "totalConnections": client.get_io_loop().run_sync(lambda: client._topology.description.server_descriptions()),
-        "address": client.address if hasattr(client, 'address') else None
-    } 
\ No newline at end of file
+        "waitQueueTimeoutMS": settings.mongodb_wait_queue_timeout_ms,
+        "pool": get_pool_stats(max_pool_size),
+        "commands": get_command_stats(),
+        "guard": db_guard.stats()
+    }
@@ -20,6 +20,12 @@ class Settings(BaseSettings):
     # MongoDB settings
     mongodb_uri: str = Field(default="mongodb://localhost:27017", alias="MONGODB_URI")
     mongodb_db_name: str = Field(default="skillswap", alias="MONGODB_DB_NAME")
+    mongodb_wait_queue_timeout_ms: int = Field(default=1000, alias="MONGODB_WAIT_QUEUE_TIMEOUT_MS")
+    collection_stats_ttl_seconds: float = Field(default=30.0, alias="COLLECTION_STATS_TTL_SECONDS")
+    collection_stats_concurrency: int = Field(default=8, alias="COLLECTION_STATS_CONCURRENCY")
+    dashboard_refresh_seconds: float = Field(default=60.0, alias="DASHBOARD_REFRESH_SECONDS")
+    leader_lease_seconds: float = Field(default=30.0, alias="LEADER_LEASE_SECONDS")
+    active_users_flush_seconds: float = Field(default=60.0, alias="ACTIVE_USERS_FLUSH_SECONDS")
     
     # JWT Authentication
     jwt_secret: str = Field(default="jwt_super_secret_key_for_development_only", alias="JWT_SECRET")
@@ -36,10 +42,21 @@ class Settings(BaseSettings):
     # Logging settings
     log_level: str = Field(default="info", alias="LOG_LEVEL")
     log_file_path: str = Field(default="logs/app.log", alias="LOG_FILE_PATH")
+    log_queue_size: int = Field(default=10000, alias="LOG_QUEUE_SIZE")  # records buffered before dropping
+    access_log_sample_rate: float = Field(default=0.1, alias="ACCESS_LOG_SAMPLE_RATE")  # share of successful requests logged
+    access_log_slow_ms: float = Field(default=1000, alias="ACCESS_LOG_SLOW_MS")  # slower requests are always logged
+    access_log_summary_interval_seconds: int = Field(default=60, alias="ACCESS_LOG_SUMMARY_INTERVAL_SECONDS")
+    
+    # Metrics
+    metrics_enabled: bool = Field(default=True, alias="METRICS_ENABLED")
+    metrics_dir: Optional[str] = Field(default=None, alias="METRICS_DIR")  # shared by workers to aggregate metrics
+    metrics_flush_interval_seconds: float = Field(default=5.0, alias="METRICS_FLUSH_INTERVAL_SECONDS")
     
     # Error tracking with Sentry
     sentry_dsn: Optional[str] = Field(default=None, alias="SENTRY_DSN")
-    sentry_traces_sample_rate: float = Field(default=1.0, alias="SENTRY_TRACES_SAMPLE_RATE")
+    sentry_traces_sample_rate: float = Field(default=0.1, alias="SENTRY_TRACES_SAMPLE_RATE")  # share of ordinary traces sent
+    sentry_traces_max_per_second: float = Field(default=10.0, alias="SENTRY_TRACES_MAX_PER_SECOND")  # per process
+    sentry_traces_slow_ms: float = Field(default=1000, alias="SENTRY_TRACES_SLOW_MS")  # slower traces are always sent
     
     # Database backups
     backup_enabled: bool = Field(default=True, alias="BACKUP_ENABLED")
@@ -51,6 +68,56 @@ class Settings(BaseSettings):
     rate_limit_enabled: bool = Field(default=True, alias="RATE_LIMIT_ENABLED")
     rate_limit_window_ms: int = Field(default=900000, alias="RATE_LIMIT_WINDOW_MS")  # 15 minutes
     rate_limit_max_requests: int = Field(default=100, alias="RATE_LIMIT_MAX_REQUESTS")
+    rate_limit_max_keys: int = Field(default=100000, alias="RATE_LIMIT_MAX_KEYS")
+    rate_limit_backend: str = Field(default="memory", alias="RATE_LIMIT_BACKEND")  # memory or redis
+    rate_limit_redis_pool_size: int = Field(default=50, alias="RATE_LIMIT_REDIS_POOL_SIZE")
+    rate_limit_local_batch: int = Field(default=0, alias="RATE_LIMIT_LOCAL_BATCH")  # tokens reserved per Redis call
+    
+    # Load shedding (adaptive concurrency limit)
+    load_shedding_enabled: bool = Field(default=True, alias="LOAD_SHEDDING_ENABLED")
+    load_shed_initial_limit: int = Field(default=50, alias="LOAD_SHED_INITIAL_LIMIT")
+    load_shed_min_limit: int = Field(default=5, alias="LOAD_SHED_MIN_LIMIT")
+    load_shed_max_limit: int = Field(default=500, alias="LOAD_SHED_MAX_LIMIT")
+    load_shed_latency_target_ms: float = Field(default=500, alias="LOAD_SHED_LATENCY_TARGET_MS")
+    load_shed_retry_after_seconds: int = Field(default=1, alias="LOAD_SHED_RETRY_AFTER_SECONDS")
+    
+    # Database bulkheads and circuit breakers
+    mongo_guard_enabled: bool = Field(default=True, alias="MONGO_GUARD_ENABLED")
+    mongo_breaker_failure_rate: float = Field(default=0.5, alias="MONGO_BREAKER_FAILURE_RATE")
+    mongo_breaker_min_calls: int = Field(default=20, alias="MONGO_BREAKER_MIN_CALLS")
+    mongo_breaker_window_seconds: int = Field(default=10, alias="MONGO_BREAKER_WINDOW_SECONDS")
+    mongo_breaker_cooldown_seconds: float = Field(default=5.0, alias="MONGO_BREAKER_COOLDOWN_SECONDS")
+    mongo_stale_cache_size: int = Field(default=1000, alias="MONGO_STALE_CACHE_SIZE")
+    
+    # Redis
+    redis_url: str = Field(default="redis://localhost:6379/0", alias="REDIS_URL")
+    
+    # Webhooks
+    payment_webhook_secret: Optional[str] = Field(default=None, alias="PAYMENT_WEBHOOK_SECRET")
+    blockchain_webhook_secret: Optional[str] = Field(default=None, alias="BLOCKCHAIN_WEBHOOK_SECRET")
+    webhook_max_body_bytes: int = Field(default=5 * 1024 * 1024, alias="WEBHOOK_MAX_BODY_BYTES")
+    webhook_workers: int = Field(default=4, alias="WEBHOOK_WORKERS")
+    webhook_batch_size: int = Field(default=50, alias="WEBHOOK_BATCH_SIZE")
+    webhook_max_attempts: int = Field(default=5, alias="WEBHOOK_MAX_ATTEMPTS")
+    webhook_retry_base_seconds: float = Field(default=2.0, alias="WEBHOOK_RETRY_BASE_SECONDS")
+    webhook_lock_seconds: int = Field(default=300, alias="WEBHOOK_LOCK_SECONDS")
+    webhook_dedup_window: int = Field(default=10000, alias="WEBHOOK_DEDUP_WINDOW")
+    webhook_dedup_retention_days: int = Field(default=7, alias="WEBHOOK_DEDUP_RETENTION_DAYS")
+    webhook_poll_interval_seconds: float = Field(default=5.0, alias="WEBHOOK_POLL_INTERVAL_SECONDS")
+    
+    # Blockchain transaction relaying
+    blockchain_rpc_url: str = Field(default="https://rpc.apothem.network", alias="BLOCKCHAIN_RPC_URL")
+    platform_wallet_private_key: Optional[str] = Field(default=None, alias="PLATFORM_WALLET_PRIVATE_KEY")
+    mentorship_token_address: Optional[str] = Field(default=None, alias="MENTORSHIP_TOKEN_ADDRESS")
+    tx_max_in_flight: int = Field(default=8, alias="TX_MAX_IN_FLIGHT")
+    tx_max_retries: int = Field(default=3, alias="TX_MAX_RETRIES")
+    tx_stuck_timeout_seconds: int = Field(default=120, alias="TX_STUCK_TIMEOUT_SECONDS")
+    tx_receipt_poll_interval_seconds: float = Field(default=3.0, alias="TX_RECEIPT_POLL_INTERVAL_SECONDS")
+    
+    # Blockchain projections
+    chain_confirmations: int = Field(default=12, alias="CHAIN_CONFIRMATIONS")
+    leaderboard_snapshot_size: int = Field(default=100, alias="LEADERBOARD_SNAPSHOT_SIZE")
+    leaderboard_snapshot_ttl_seconds: float = Field(default=15.0, alias="LEADERBOARD_SNAPSHOT_TTL_SECONDS")
     
     # Security
     encryption_key: Optional[str] = Field(default=None, alias="ENCRYPTION_KEY")
@@ -0,0 +1,8 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+
+class SessionPaymentCreate(BaseModel):
+    mentor: str = Field(..., pattern=r"^0x[0-9a-fA-F]{40}$")
+    mentee: str = Field(..., pattern=r"^0x[0-9a-fA-F]{40}$")
+    amount: int = Field(..., gt=0)
+    session_id: Optional[str] = None
@@ -1,14 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
 from typing import Dict, List, Any, Optional
-from datetime import datetime
 
 from app.utils.auth import get_current_user
 from app.models.user import TokenData
 from app.utils.backup import DatabaseBackup
 from app.utils.db_indexes import get_collection_stats, analyze_slow_queries
 from app.utils.logging import get_logger
-from app.config.database import db, check_db_connection, get_connection_stats
+from app.config.database import check_db_connection, get_connection_stats
 from app.utils.migrations import MigrationManager
+from app.utils.webhook_queue import webhook_pool
+from app.utils.load_shedding import load_shedder
+from app.utils.index_advisor import build_index_report
+from app.utils.dashboard import dashboard_snapshot
+from app.utils.active_users import active_user_tracker
+from app.utils.db_guard import db_guard
 
 logger = get_logger("admin")
 router = APIRouter(prefix="/admin", tags=["Admin"])
@@ -25,41 +30,33 @@ async def check_admin_permission(token_data: TokenData = Depends(get_current_use
 
 @router.get("/dashboard", response_model=Dict[str, Any])
 async def admin_dashboard(token_data: TokenData = Depends(check_admin_permission)):
-    """Admin dashboard overview"""
-    # Get database statistics
-    db_stats = await get_collection_stats()
-    
-    # Get user statistics
-    total_users = await db.users.count_documents({})
-    active_users = await db.users.count_documents({"last_active": {"$gte": datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)}})
+    """Admin dashboard overview, from the periodically refreshed snapshot"""
+    stats = await dashboard_snapshot.get()
     
-    # Get other statistics (customize as needed)
-    total_sessions = await db.sessions.count_documents({})
+    return {
+        "success": True,
+        "stats": stats
+    }
+
+@router.get("/active-users", response_model=Dict[str, Any])
+async def active_users(
+    days: int = 30,
+    token_data: TokenData = Depends(check_admin_permission)
+):
+    """Approximate daily, weekly and monthly active users, with daily history"""
+    counts = await db_guard.run("admin_analytics", active_user_tracker.counts)
+    history = await db_guard.run("admin_analytics", lambda: active_user_tracker.history(min(max(days, 1), 365)))
     
     return {
         "success": True,
-        "stats": {
-            "users": {
-                "total": total_users,
-                "active_today": active_users
-            },
-            "sessions": {
-                "total": total_sessions
-            },
-            "database": {
-                "collections": len(db_stats),
-                "details": db_stats
-            },
-            "system": {
-                "environment": "production",
-                "version": "1.0.0"
-            }
-        }
+        "active_users": counts,
+        "history": history
     }
 
 @router.get("/db/stats", response_model=Dict[str, Any])
 async def database_stats(token_data: TokenData = Depends(check_admin_permission)):
     """Database statistics"""
+    # Guards each of its queries itself
     db_stats = await get_collection_stats()
     connection_stats = get_connection_stats()
     db_connection = await check_db_connection()
@@ -76,16 +73,56 @@ async def database_stats(token_data: TokenData = Depends(check_admin_permission)
     }
 
 @router.get("/db/slow-queries", response_model=Dict[str, Any])
-async def slow_queries(token_data: TokenData = Depends(check_admin_permission)):
-    """Analyze slow queries"""
-    queries = await analyze_slow_queries()
+async def slow_queries(
+    limit: int = 1000,
+    snapshot: bool = False,
+    token_data: TokenData = Depends(check_admin_permission)
+):
+    """Slow query shapes ranked by total time, with the trend since the last snapshot"""
+    analysis = await db_guard.run(
+        "admin_analytics",
+        lambda: analyze_slow_queries(min(max(limit, 1), 10000), save_snapshot=snapshot)
+    )
     
     return {
         "success": True,
-        "queries": queries,
+        "queries": analysis["shapes"],
+        "analysis": {k: v for k, v in analysis.items() if k != "shapes"},
         "note": "To enable query profiling, run db.setProfilingLevel(1, {slowms: 100}) in MongoDB"
     }
 
+@router.get("/db/index-advisor", response_model=Dict[str, Any])
+async def index_advisor(
+    profile_limit: int = 1000,
+    token_data: TokenData = Depends(check_admin_permission)
+):
+    """Unused, redundant and low-selectivity indexes, and indexes missing for profiled queries"""
+    # Guards each of its queries itself
+    report = await build_index_report(min(max(profile_limit, 0), 10000))
+    
+    return {
+        "success": True,
+        "report": report
+    }
+
+@router.get("/webhooks", response_model=Dict[str, Any])
+async def webhook_queue_stats(token_data: TokenData = Depends(check_admin_permission)):
+    """Webhook queue depth and dead letters"""
+    stats = await webhook_pool.stats()
+    
+    return {
+        "success": True,
+        "stats": stats
+    }
+
+@router.get("/load", response_model=Dict[str, Any])
+async def load_shedding_stats(token_data: TokenData = Depends(check_admin_permission)):
+    """Adaptive concurrency limit and shed request counts"""
+    return {
+        "success": True,
+        "stats": load_shedder.stats()
+    }
+
 @router.post("/db/backup", response_model=Dict[str, Any])
 async def create_backup(
     background_tasks: BackgroundTasks,
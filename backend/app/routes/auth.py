@@ -3,7 +3,7 @@ from fastapi.security import OAuth2PasswordRequestForm
 from datetime import datetime, timedelta
 from typing import Dict, Any
 
-from app.config.database import db
+from app.config import database
 from app.models.user import UserCreate, UserResponse, Token
 from app.utils.auth import (
     verify_password, 
@@ -11,6 +11,8 @@ from app.utils.auth import (
     create_access_token, 
     create_refresh_token
 )
+from app.utils.active_users import active_user_tracker
+from app.utils.db_guard import db_guard
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -18,12 +20,12 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 async def register_user(user_data: UserCreate):
     """Register a new user"""
     # Check if user already exists
-    user = await db.users.find_one({
+    user = await db_guard.run("auth", lambda: database.db.users.find_one({
         "$or": [
             {"email": user_data.email.lower()},
             {"username": user_data.username.lower()}
         ]
-    })
+    }))
     
     if user:
         raise HTTPException(
@@ -47,7 +49,7 @@ async def register_user(user_data: UserCreate):
     del user_dict["password"]
     
     # Insert into database
-    user_id = await db.users.insert_one(user_dict)
+    user_id = await db_guard.run("auth", lambda: database.db.users.insert_one(user_dict))
     
     # Generate tokens
     access_token = create_access_token(
@@ -83,12 +85,12 @@ async def register_user(user_data: UserCreate):
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     """Login user with username/email and password"""
     # Find user by username or email
-    user = await db.users.find_one({
+    user = await db_guard.run("auth", lambda: database.db.users.find_one({
         "$or": [
             {"email": form_data.username.lower()},
             {"username": form_data.username.lower()}
         ]
-    })
+    }))
     
     if not user:
         raise HTTPException(
@@ -106,25 +108,27 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     # Verify password
     if not verify_password(form_data.password, user["hashed_password"]):
         # Increment failed login attempts
-        await db.users.update_one(
+        await db_guard.run("auth", lambda: database.db.users.update_one(
             {"_id": user["_id"]},
             {"$inc": {"failed_login_attempts": 1}}
-        )
+        ))
         
         # Lock account after 5 failed attempts
         if user.get("failed_login_attempts", 0) + 1 >= 5:
-            await db.users.update_one(
+            await db_guard.run("auth", lambda: database.db.users.update_one(
                 {"_id": user["_id"]},
                 {"$set": {"account_locked": True}}
-            )
+            ))
         
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
     
+    active_user_tracker.record(str(user["_id"]))
+    
     # Reset failed login attempts and update last active
-    await db.users.update_one(
+    await db_guard.run("auth", lambda: database.db.users.update_one(
         {"_id": user["_id"]},
         {
             "$set": {
@@ -132,7 +136,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
                 "last_active": datetime.utcnow()
             }
         }
-    )
+    ))
     
     # Generate tokens
     access_token = create_access_token(
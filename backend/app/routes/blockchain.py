@@ -2,6 +2,12 @@ from fastapi import APIRouter, Depends, HTTPException, status, Path, Query
 from typing import Dict, Any, List, Optional
 
 from app.utils.auth import get_current_user, TokenData
+from app.utils.reputation import get_leaderboard, get_mentor_reputation
+from app.utils.token_ledger import get_balance, list_balances, get_statement
+from app.utils.mentor_directory import search_mentors, get_mentor
+from app.utils.chain_buffer import confirmation_buffer
+from app.utils.tx_queue import get_tx_queue, get_transaction
+from app.models.blockchain import SessionPaymentCreate
 
 router = APIRouter(prefix="/blockchain", tags=["Blockchain"])
 
@@ -72,32 +78,195 @@ async def get_events_by_address(
         }
     }
 
+@router.get("/sync", response_model=Dict[str, Any])
+async def get_sync_status():
+    """
+    Get the event ingestion status and unconfirmed events near the head
+    """
+    # Blocks are buffered by whichever process consumes them, so read the stored copy
+    buffer = await confirmation_buffer.persisted()
+    return {
+        "success": True,
+        "data": {
+            **buffer.stats(),
+            "pending_events": buffer.pending_events()
+        }
+    }
+
 @router.get("/tokens", response_model=Dict[str, Any])
-async def get_tokens():
+async def get_tokens(
+    address: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100)
+):
     """
-    Get token info
+    Get token balances (a single address, or the top holders)
     """
+    if address:
+        balance = await get_balance(address)
+        return {
+            "success": True,
+            "data": balance
+        }
+    
+    balances = await list_balances(limit)
+    
     return {
         "success": True,
-        "message": "Get tokens route"
+        "data": balances
+    }
+
+@router.get("/tokens/{address}/statement", response_model=Dict[str, Any])
+async def get_token_statement(
+    address: str = Path(...),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, pattern=r"^\d+:\d+$"),
+    kind: Optional[str] = Query(None, pattern="^(transfer|session_payment)$"),
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Get the token transfers and session payments of an address
+    """
+    statement = await get_statement(address, limit, cursor, kind)
+    
+    return {
+        "success": True,
+        "data": statement
     }
 
 @router.get("/mentors", response_model=Dict[str, Any])
-async def get_blockchain_mentors():
+async def get_blockchain_mentors(
+    skill: Optional[str] = Query(None),
+    min_rate: Optional[int] = Query(None, ge=0),
+    max_rate: Optional[int] = Query(None, ge=0),
+    include_inactive: bool = Query(False),
+    sort: str = Query("rate_asc", pattern="^rate_(asc|desc)$"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, pattern=r"^\d+:0x[0-9a-fA-F]+$")
+):
     """
     Get blockchain mentor list
     """
+    result = await search_mentors(
+        skill=skill,
+        min_rate=min_rate,
+        max_rate=max_rate,
+        include_inactive=include_inactive,
+        descending=sort == "rate_desc",
+        limit=limit,
+        cursor=cursor
+    )
+    
+    return {
+        "success": True,
+        "data": result
+    }
+
+@router.get("/mentors/{address}", response_model=Dict[str, Any])
+async def get_blockchain_mentor(address: str = Path(...)):
+    """
+    Get a blockchain mentor profile
+    """
+    mentor = await get_mentor(address)
+    
+    if not mentor:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Mentor not found"
+        )
+    
+    return {
+        "success": True,
+        "data": mentor
+    }
+
+@router.get("/reputation/leaderboard", response_model=Dict[str, Any])
+async def get_reputation_leaderboard(limit: int = Query(20, ge=1, le=500)):
+    """
+    Get the top rated mentors
+    """
+    leaderboard = await get_leaderboard(limit)
+    
     return {
         "success": True,
-        "message": "Get blockchain mentors route"
+        "data": leaderboard
     }
 
-@router.post("/transactions", response_model=Dict[str, Any])
-async def create_blockchain_transaction(current_user: TokenData = Depends(get_current_user)):
+@router.get("/reputation/{address}", response_model=Dict[str, Any])
+async def get_reputation(address: str = Path(...)):
+    """
+    Get the projected reputation of a mentor
     """
-    Create a blockchain transaction
+    reputation = await get_mentor_reputation(address)
+    
+    if not reputation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No ratings found for this mentor"
+        )
+    
+    return {
+        "success": True,
+        "data": reputation
+    }
+
+@router.post("/transactions", response_model=Dict[str, Any], status_code=status.HTTP_202_ACCEPTED)
+async def create_blockchain_transaction(
+    payment: SessionPaymentCreate,
+    current_user: TokenData = Depends(get_current_user)
+):
     """
+    Create a blockchain transaction (session payment relayed by the platform wallet, admin only)
+    """
+    # The platform wallet pays, so only admins may choose who gets paid and how much
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to access this resource"
+        )
+    
+    tx_queue = get_tx_queue()
+    if not tx_queue:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Transaction relaying is not configured"
+        )
+    
+    tx_id = await tx_queue.submit_session_payment(
+        current_user.user_id,
+        payment.mentor,
+        payment.mentee,
+        payment.amount,
+        {"session_id": payment.session_id}
+    )
+    
+    return {
+        "success": True,
+        "message": "Transaction queued",
+        "data": {
+            "transaction_id": tx_id,
+            "status": "queued"
+        }
+    }
+
+@router.get("/transactions/{tx_id}", response_model=Dict[str, Any])
+async def get_blockchain_transaction(
+    tx_id: str = Path(...),
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Get the status of a relayed transaction
+    """
+    transaction = await get_transaction(tx_id)
+    
+    if not transaction or (
+        transaction["user_id"] != current_user.user_id and current_user.role != "admin"
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Transaction not found"
+        )
+    
     return {
         "success": True,
-        "message": "Create blockchain transaction route"
+        "data": transaction
     } 
\ No newline at end of file
@@ -2,9 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException, status, Path
 from typing import Dict, Any, List
 from bson import ObjectId
 
-from app.config.database import db
+from app.config import database
 from app.models.user import UserResponse
 from app.utils.auth import get_current_user, TokenData
+from app.utils.db_guard import db_guard
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -21,7 +22,7 @@ async def get_all_users(current_user: TokenData = Depends(get_current_user)):
         )
     
     # Get all users from database
-    users = await db.users.find().to_list(1000)
+    users = await db_guard.run("user_reads", lambda: database.db.users.find().to_list(1000))
     
     # Transform results
     users = [{
@@ -57,8 +58,12 @@ async def get_user(
                 detail="You do not have permission to access this resource"
             )
     
-    # Get user from database
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    # Get user from database; the last copy read is served while the database is failing
+    user = await db_guard.run(
+        "user_reads",
+        lambda: database.db.users.find_one({"_id": ObjectId(user_id)}),
+        cache_key=("user", user_id)
+    )
     
     if not user:
         raise HTTPException(
@@ -1,36 +1,119 @@
-from fastapi import APIRouter, Request
-from typing import Dict, Any
+from fastapi import APIRouter, HTTPException, Request, status
+from typing import Dict, Any, List, Optional
 
+from app.config.settings import get_settings
+from app.utils.chain_events import apply_events
+from app.utils.chain_buffer import confirmation_buffer, DeepReorgError
+from app.utils.logging import get_logger
+from app.utils.metrics import metrics_registry
+from app.utils.webhook_queue import webhook_pool, register_webhook_handler, verify_signature, WebhookRejected
+from app.utils.webhook_dedup import EVENT_ID_HEADERS, delivery_key, claim_delivery, release_delivery
+
+settings = get_settings()
+logger = get_logger("webhooks")
 router = APIRouter(prefix="/webhooks", tags=["Webhooks"])
 
-@router.post("/payment", response_model=Dict[str, Any])
+async def accept_webhook(request: Request, source: str, secret: Optional[str]) -> Dict[str, Any]:
+    """Verify a delivery and persist it for the background workers"""
+    # Reject oversized bodies before reading them
+    content_length = request.headers.get("Content-Length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.webhook_max_body_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Webhook body too large"
+        )
+
+    # The signature is checked over the raw bytes; the body is only parsed
+    # by the workers, after it has been verified. Chunked bodies carry no
+    # Content-Length, so the limit is enforced while reading as well.
+    chunks: List[bytes] = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > settings.webhook_max_body_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail="Webhook body too large"
+            )
+        chunks.append(chunk)
+    body = b"".join(chunks)
+
+    if not verify_signature(secret, body, request.headers.get("X-Signature")):
+        logger.warning(f"Rejected {source} webhook with invalid signature")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid webhook signature"
+        )
+
+    event_id = next((request.headers[h] for h in EVENT_ID_HEADERS if h in request.headers), None)
+    key = delivery_key(source, event_id, body)
+
+    # Redeliveries are acknowledged without being queued again
+    if not await claim_delivery(key):
+        return {
+            "success": True,
+            "message": f"Duplicate {source} webhook ignored",
+            "duplicate": True
+        }
+
+    try:
+        delivery_id = await webhook_pool.enqueue(source, body)
+    except Exception:
+        await release_delivery(key)
+        raise
+
+    return {
+        "success": True,
+        "message": f"{source.capitalize()} webhook accepted",
+        "id": delivery_id
+    }
+
+@router.post("/payment", response_model=Dict[str, Any], status_code=status.HTTP_202_ACCEPTED)
 async def payment_webhook(request: Request):
     """
     Webhook for payment events
     """
-    body = await request.json()
-    
-    # Process payment webhook
-    # In a real application, you would verify the webhook signature
-    # and handle payment events accordingly
-    
-    return {
-        "success": True,
-        "message": "Payment webhook received"
-    }
+    return await accept_webhook(request, "payment", settings.payment_webhook_secret)
 
-@router.post("/blockchain", response_model=Dict[str, Any])
+@router.post("/blockchain", response_model=Dict[str, Any], status_code=status.HTTP_202_ACCEPTED)
 async def blockchain_webhook(request: Request):
     """
     Webhook for blockchain events
     """
-    body = await request.json()
-    
-    # Process blockchain webhook
-    # In a real application, you would verify the webhook signature
-    # and handle blockchain events accordingly
-    
-    return {
-        "success": True,
-        "message": "Blockchain webhook received"
-    } 
\ No newline at end of file
+    return await accept_webhook(request, "blockchain", settings.blockchain_webhook_secret)
+
+@register_webhook_handler("payment")
+async def process_payment_webhooks(events: List[Dict[str, Any]]) -> None:
+    """Handle queued payment provider events"""
+    for body in events:
+        # No payment provider is integrated yet; events are acknowledged
+        # and logged so they can be replayed once one is
+        logger.info(f"Payment webhook processed: {body.get('type', 'unknown')}")
+
+# Blocks must reach the confirmation buffer in order, so a single consumer
+# across all processes drains them
+@register_webhook_handler("blockchain", ordered=True, on_takeover=confirmation_buffer.load_cursor)
+async def process_blockchain_webhooks(events: List[Dict[str, Any]]) -> None:
+    """Apply queued blockchain deliveries to the projections"""
+    # Bare events are treated as already final and applied together, so a
+    # batch costs one projection pass; blocks near the head go through the
+    # confirmation buffer
+    final_events: List[Dict[str, Any]] = []
+    for body in events:
+        if "blocks" in body:
+            if final_events:
+                await apply_events(final_events)
+                final_events = []
+            try:
+                await confirmation_buffer.add_blocks(body["blocks"])
+            except DeepReorgError as e:
+                # Retrying cannot help: the provider has to resend the chain
+                # from the finalized block, so this needs an operator
+                metrics_registry.inc("chain_deep_reorgs_total")
+                logger.error(f"Blockchain webhook needs a resend from the provider: {str(e)}")
+                raise WebhookRejected(f"Deep reorg: {str(e)}") from e
+        else:
+            final_events.extend(body.get("events", []))
+
+    if final_events:
+        await apply_events(final_events)
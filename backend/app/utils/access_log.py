@@ -0,0 +1,124 @@
+import asyncio
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.types import Scope
+
+from app.config.settings import get_settings
+from app.utils.logging import get_logger
+from app.utils.rate_limit import PolicyTable
+
+settings = get_settings()
+logger = get_logger("access")
+
+# (method, path prefix, sample rate); "*" matches any method and the
+# longest matching prefix wins. Errors and slow requests are always logged.
+DEFAULT_RATE = settings.access_log_sample_rate
+ACCESS_LOG_SAMPLE_RATES: List[Tuple[str, str, float]] = [
+    ("*", "/", DEFAULT_RATE),
+    ("*", "/health", DEFAULT_RATE / 10),
+    ("*", "/metrics", DEFAULT_RATE / 10),
+    # Kept in full for auditing
+    ("*", "/api/auth", 1.0),
+    ("*", "/api/admin", 1.0),
+]
+
+def is_sampled(request_id: str, rate: float) -> bool:
+    """
+    Deterministic sampling decision for a request
+
+    The same request ID always gets the same answer, so every log line of
+    a sampled request is kept and the rest of an unsampled one is not.
+    """
+    if rate >= 1:
+        return True
+    if rate <= 0:
+        return False
+    return zlib.crc32(request_id.encode()) < rate * 0x100000000
+
+class AccessLogSampler:
+    """
+    Decides which requests get an access log line
+
+    Requests that are not logged are still counted per route template and
+    status class, and the counters are written as one summary line every
+    `access_log_summary_interval_seconds`, from a timer so quiet periods
+    are summarized too, and at shutdown.
+    """
+
+    def __init__(self, sample_rates: List[Tuple[str, str, float]]):
+        self.rates: PolicyTable[float] = PolicyTable(sample_rates)
+        self.slow_ms = settings.access_log_slow_ms
+        self.interval = settings.access_log_summary_interval_seconds
+        # (method, route, status class) -> [count, total duration in ms]
+        self.unsampled: Dict[Tuple[str, str, str], List[float]] = {}
+        self._last_flush = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+    def should_log(self, scope: Scope, request_id: str, status_code: int, duration_ms: float) -> bool:
+        if status_code >= 400 or duration_ms >= self.slow_ms:
+            return True
+
+        rate = self.rates.match(scope["method"], scope["path"])
+        if is_sampled(request_id, DEFAULT_RATE if rate is None else rate):
+            return True
+
+        self._count(scope, status_code, duration_ms)
+        return False
+
+    def _count(self, scope: Scope, status_code: int, duration_ms: float) -> None:
+        # Route templates keep the number of counters bounded
+        route = scope.get("route")
+        key = (scope["method"], getattr(route, "path", "unmatched"), f"{status_code // 100}xx")
+        counter = self.unsampled.get(key)
+        if counter is None:
+            self.unsampled[key] = [1, duration_ms]
+        else:
+            counter[0] += 1
+            counter[1] += duration_ms
+
+        if time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Log and reset the counters of unsampled requests"""
+        self._last_flush = time.monotonic()
+        if not self.unsampled:
+            return
+
+        summary: List[Dict[str, Any]] = [
+            {
+                "method": method,
+                "route": route,
+                "status": status_class,
+                "count": int(count),
+                "avg_duration_ms": round(total / count, 2)
+            }
+            for (method, route, status_class), (count, total) in self.unsampled.items()
+        ]
+        self.unsampled = {}
+        logger.info(
+            f"Unsampled requests: {sum(s['count'] for s in summary)}",
+            extra={"unsampled": summary}
+        )
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(max(self.interval - (time.monotonic() - self._last_flush), 0))
+            if time.monotonic() - self._last_flush >= self.interval:
+                self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # Keep the requests counted since the last summary
+        self.flush()
+
+access_log_sampler = AccessLogSampler(ACCESS_LOG_SAMPLE_RATES)
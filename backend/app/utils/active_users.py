@@ -0,0 +1,275 @@
+import asyncio
+import hashlib
+import math
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson.binary import Binary
+from pymongo.errors import DuplicateKeyError
+
+from app.config import database
+from app.config.settings import get_settings
+from app.utils.db_guard import db_guard
+from app.utils.logging import get_logger
+
+settings = get_settings()
+logger = get_logger("active_users")
+
+# 2^14 one-byte registers: 16 KB per day and a standard error of about 0.8%
+HLL_PRECISION = 14
+HLL_REGISTERS = 1 << HLL_PRECISION
+
+SKETCH_COLLECTION = "active_user_sketches"
+
+# Attempts at the read-merge-write of a stored sketch before giving up until the next flush
+PERSIST_ATTEMPTS = 5
+
+# Past days' sketches kept in memory; enough for a monthly window plus a week of history
+CACHED_DAYS = 40
+
+_RANK_BITS = 64 - HLL_PRECISION
+_INVERSE_POWERS = [2.0 ** -rank for rank in range(_RANK_BITS + 2)]
+_ALPHA = 0.7213 / (1 + 1.079 / HLL_REGISTERS)
+# 0x80 in every byte; see HyperLogLog.merge
+_HIGH_BITS = int.from_bytes(b"\x80" * HLL_REGISTERS, "big")
+
+class HyperLogLog:
+    """
+    Distinct count sketch with one byte per register
+
+    A value is hashed to 64 bits; the first HLL_PRECISION bits pick a
+    register, which keeps the longest run of leading zeros seen in the
+    rest. Sketches of the same precision merge by taking the register-wise
+    maximum, so a merged sketch counts the union of its inputs.
+    """
+    __slots__ = ("registers",)
+
+    def __init__(self, registers: Optional[bytes] = None):
+        if registers is not None and len(registers) != HLL_REGISTERS:
+            raise ValueError(f"Expected {HLL_REGISTERS} registers, got {len(registers)}")
+        self.registers = bytearray(registers) if registers is not None else bytearray(HLL_REGISTERS)
+
+    def add(self, value: str) -> bool:
+        """Add a value; returns whether a register changed"""
+        hashed = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+        index = hashed >> _RANK_BITS
+        rank = _RANK_BITS - (hashed & ((1 << _RANK_BITS) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Register-wise maximum of two sketches, as a new sketch"""
+        # Every register is below 0x80, so (a | 0x80) - b keeps each byte's
+        # high bit exactly when a >= b without borrowing from its neighbour;
+        # spreading that bit over the byte selects a or b for all registers
+        # in a few big-integer operations instead of a Python-level loop
+        a = int.from_bytes(self.registers, "big")
+        b = int.from_bytes(other.registers, "big")
+        mask = ((((a | _HIGH_BITS) - b) & _HIGH_BITS) >> 7) * 0xFF
+        return HyperLogLog(((a & mask) | (b & ~mask)).to_bytes(HLL_REGISTERS, "big"))
+
+    @classmethod
+    def union(cls, sketches: Iterable["HyperLogLog"]) -> "HyperLogLog":
+        merged = cls()
+        for sketch in sketches:
+            merged = merged.merge(sketch)
+        return merged
+
+    def count(self) -> int:
+        estimate = _ALPHA * HLL_REGISTERS ** 2 / sum(map(_INVERSE_POWERS.__getitem__, self.registers))
+        empty = self.registers.count(0)
+        # Linear counting is more accurate while many registers are still empty;
+        # 64-bit hashes make the large-range correction unnecessary
+        if estimate <= 2.5 * HLL_REGISTERS and empty:
+            estimate = HLL_REGISTERS * math.log(HLL_REGISTERS / empty)
+        return round(estimate)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
+
+def _day_key(day: date) -> str:
+    return day.isoformat()
+
+class ActiveUserTracker:
+    """
+    Daily, weekly and monthly active users from per-day HyperLogLog sketches
+
+    Authentication records the user in today's in-memory sketch, which costs
+    a hash and a register compare. Every `active_users_flush_seconds` each
+    worker merges its changed sketches into the stored ones (one document of
+    registers per UTC day) with an optimistic version check, so concurrent
+    workers never overwrite each other's users. Weekly and monthly counts
+    are the union of the daily sketches in the window.
+    """
+
+    def __init__(self):
+        # Users recorded by this worker (today, and yesterday until flushed)
+        self._live: Dict[str, HyperLogLog] = {}
+        self._dirty: set = set()
+        # Stored sketches per day and unions of completed days per window,
+        # with the monotonic time they were loaded
+        self._stored: Dict[str, Tuple[HyperLogLog, float]] = {}
+        self._unions: Dict[Tuple[str, str], Tuple[HyperLogLog, float]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flush: Optional[asyncio.Future] = None
+
+    def record(self, user_id: str, when: Optional[datetime] = None) -> None:
+        key = _day_key((when or datetime.utcnow()).date())
+        sketch = self._live.get(key)
+        if sketch is None:
+            sketch = self._live[key] = HyperLogLog()
+        if sketch.add(user_id):
+            self._dirty.add(key)
+
+    async def _persist(self, key: str, sketch: HyperLogLog) -> Optional[HyperLogLog]:
+        """Merge a sketch into the stored one; returns the merged sketch"""
+        collection = database.db[SKETCH_COLLECTION]
+        for _ in range(PERSIST_ATTEMPTS):
+            doc = await collection.find_one({"_id": key})
+            if doc is None:
+                try:
+                    await collection.insert_one({
+                        "_id": key,
+                        "registers": Binary(sketch.to_bytes()),
+                        "version": 1,
+                        "updated_at": datetime.utcnow()
+                    })
+                    return sketch
+                except DuplicateKeyError:
+                    # Another worker stored the day first; merge into theirs
+                    continue
+
+            stored = HyperLogLog(doc["registers"])
+            merged = stored.merge(sketch)
+            if merged.registers == stored.registers:
+                return merged
+            result = await collection.update_one(
+                {"_id": key, "version": doc["version"]},
+                {
+                    "$set": {"registers": Binary(merged.to_bytes()), "updated_at": datetime.utcnow()},
+                    "$inc": {"version": 1}
+                }
+            )
+            if result.matched_count:
+                return merged
+        logger.warning(f"Active user sketch for {key} changed concurrently; retrying at next flush")
+        return None
+
+    async def _do_flush(self) -> None:
+        today = _day_key(datetime.utcnow().date())
+        for key in sorted(self._dirty):
+            self._dirty.discard(key)
+            try:
+                merged = await db_guard.run("background", lambda: self._persist(key, self._live[key]))
+            except Exception as e:
+                logger.error(f"Failed to persist active user sketch for {key}: {str(e)}")
+                merged = None
+            if merged is None:
+                self._dirty.add(key)
+            else:
+                # Includes the other workers' users, so counts pick them up
+                self._stored[key] = (merged, time.monotonic())
+
+        for key in [k for k in self._live if k != today and k not in self._dirty]:
+            del self._live[key]
+
+    async def flush(self) -> None:
+        """Persist changed sketches, joining a flush already in progress"""
+        if self._flush is None or self._flush.done():
+            self._flush = asyncio.ensure_future(self._do_flush())
+        await asyncio.shield(self._flush)
+
+    def _is_fresh(self, day: str, loaded_at: float) -> bool:
+        # Days before yesterday no longer change; today's sketch, and
+        # yesterday's until every worker has flushed it after midnight, are
+        # reloaded once per flush interval
+        settled = _day_key(datetime.utcnow().date() - timedelta(days=1))
+        return day < settled or time.monotonic() - loaded_at < settings.active_users_flush_seconds
+
+    async def _sketches(self, days: List[str]) -> Dict[str, HyperLogLog]:
+        """Stored sketches of the given days merged with this worker's unflushed users"""
+        sketches: Dict[str, HyperLogLog] = {}
+        missing: List[str] = []
+        for key in days:
+            cached = self._stored.get(key)
+            if cached and self._is_fresh(key, cached[1]):
+                sketches[key] = cached[0]
+            else:
+                missing.append(key)
+
+        if missing:
+            now = time.monotonic()
+            async for doc in database.db[SKETCH_COLLECTION].find({"_id": {"$in": missing}}):
+                sketches[doc["_id"]] = HyperLogLog(doc["registers"])
+            for key in missing:
+                sketch = sketches.setdefault(key, HyperLogLog())
+                self._stored[key] = (sketch, now)
+
+        for key in days:
+            if key in self._live:
+                sketches[key] = sketches[key].merge(self._live[key])
+
+        if len(self._stored) > CACHED_DAYS:
+            for key in sorted(self._stored)[:len(self._stored) - CACHED_DAYS]:
+                del self._stored[key]
+        return sketches
+
+    async def _union(self, days: List[str]) -> HyperLogLog:
+        """Union of consecutive days, cached while its last day can still change"""
+        window = (days[0], days[-1])
+        cached = self._unions.get(window)
+        if cached and self._is_fresh(window[1], cached[1]) and window[1] not in self._live:
+            return cached[0]
+
+        sketches = await self._sketches(days)
+        union = HyperLogLog.union(sketches.values())
+        if len(self._unions) >= CACHED_DAYS:
+            self._unions.clear()
+        self._unions[window] = (union, time.monotonic())
+        return union
+
+    async def counts(self, day: Optional[date] = None) -> Dict[str, Any]:
+        """Distinct users active on a day and in the 7 and 30 days ending on it"""
+        day = day or datetime.utcnow().date()
+        window = [_day_key(day - timedelta(days=offset)) for offset in range(29, -1, -1)]
+
+        # Only the current day changes between calls; the earlier days of
+        # each window are merged once and reused
+        current = (await self._sketches(window[-1:]))[window[-1]]
+        weekly = current.merge(await self._union(window[-7:-1]))
+        monthly = weekly.merge(await self._union(window[:-7]))
+        return {
+            "date": window[-1],
+            "dau": current.count(),
+            "wau": weekly.count(),
+            "mau": monthly.count()
+        }
+
+    async def history(self, days: int = 30) -> List[Dict[str, Any]]:
+        """Daily active users for each of the last `days` days, oldest first"""
+        today = datetime.utcnow().date()
+        window = [_day_key(today - timedelta(days=offset)) for offset in range(days - 1, -1, -1)]
+        sketches = await self._sketches(window)
+        return [{"date": key, "dau": sketches[key].count()} for key in window]
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.active_users_flush_seconds)
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # Keep the users recorded since the last flush
+        await self.flush()
+
+active_user_tracker = ActiveUserTracker()
@@ -1,12 +1,15 @@
 import os
+import time
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List
+from functools import lru_cache
+from typing import Optional, Dict, List, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status, Header
 from fastapi.security import OAuth2PasswordBearer
 from app.config.settings import get_settings
 from app.models.user import TokenData
+from app.utils.active_users import active_user_tracker
 
 settings = get_settings()
 
@@ -69,6 +72,31 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> TokenData:
             permissions=permissions,
             exp=exp
         )
+        active_user_tracker.record(user_id)
         return token_data
     except JWTError:
-        raise credentials_exception 
\ No newline at end of file
+        raise credentials_exception 
+
+@lru_cache(maxsize=10000)
+def _decode_subject(token: str) -> Tuple[Optional[str], Optional[float]]:
+    # Expiry is checked by the caller, so cached results never outlive the token
+    try:
+        payload = jwt.decode(
+            token,
+            settings.jwt_secret,
+            algorithms=[settings.jwt_algorithm],
+            options={"verify_exp": False}
+        )
+    except JWTError:
+        return None, None
+    return payload.get("sub"), payload.get("exp")
+
+def get_token_subject(token: str) -> Optional[str]:
+    """
+    Return the user ID of a signed, unexpired token, or None otherwise
+    Cached so per-request callers (such as rate limiting) pay for decoding once per token
+    """
+    subject, expires_at = _decode_subject(token)
+    if expires_at is not None and expires_at <= time.time():
+        return None
+    return subject
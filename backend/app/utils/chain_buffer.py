@@ -0,0 +1,234 @@
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.config import database
+from app.config.settings import get_settings
+from app.utils.chain_events import apply_events, normalize_event
+from app.utils.logging import get_logger
+
+settings = get_settings()
+logger = get_logger("blockchain.buffer")
+
+class DeepReorgError(Exception):
+    """Raised when a reorg reaches below the oldest buffered block"""
+
+class ConfirmationBuffer:
+    """
+    Two-tier event ingestion near the chain head
+
+    The newest `confirmations` blocks are held keyed by block hash and
+    mirrored to the chain_buffer collection, so a restarted or newly elected
+    consumer resumes with the same blocks. A block is only applied to the
+    Mongo projections once enough descendants have been buffered on top of
+    it. When a block arrives whose parent is not the current head, the
+    buffered blocks after its parent are discarded, so a reorg only rolls
+    back the orphaned blocks and never touches the projections.
+
+    A block more than one ahead of the head with an unknown parent follows
+    a gap rather than a reorg: it waits, a backfill of the missing range is
+    requested, and it is buffered once the gap is filled.
+    """
+
+    def __init__(self, confirmations: int):
+        self.confirmations = confirmations
+        self.blocks: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Blocks past a gap, keyed by hash
+        self.waiting: Dict[str, Dict[str, Any]] = {}
+        self.finalized: Optional[Dict[str, Any]] = None
+        self.backfill: Optional[Dict[str, Any]] = None
+        self.reorgs = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def collection(self):
+        return database.db.chain_buffer
+
+    @staticmethod
+    def _normalize_block(raw: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "number": int(raw["number"]),
+            "hash": raw["hash"].lower(),
+            "parent_hash": (raw.get("parent_hash") or raw["parentHash"]).lower(),
+            "events": raw.get("events", []),
+        }
+
+    @property
+    def head(self) -> Optional[Dict[str, Any]]:
+        if self.blocks:
+            return next(reversed(self.blocks.values()))
+        return self.finalized
+
+    async def load_cursor(self) -> Optional[Dict[str, Any]]:
+        """Restore the finalized block and the buffer so ingestion resumes where it stopped"""
+        async with self._lock:
+            self.finalized = await database.db.chain_sync.find_one({"_id": "finalized"})
+            self.backfill = await database.db.chain_sync.find_one({"_id": "backfill"})
+            reorgs = await database.db.chain_sync.find_one({"_id": "reorgs"})
+            self.reorgs = reorgs["count"] if reorgs else 0
+
+            self.blocks.clear()
+            self.waiting.clear()
+            async for doc in self.collection.find(sort=[("number", 1)]):
+                block = {key: doc[key] for key in ("number", "hash", "parent_hash", "events")}
+                if self.finalized and block["number"] <= self.finalized["number"]:
+                    # Finalized just before the previous consumer stopped
+                    continue
+                if doc.get("waiting"):
+                    self.waiting[block["hash"]] = block
+                else:
+                    self.blocks[block["hash"]] = block
+            return self.finalized
+
+    async def _store(self, block: Dict[str, Any], waiting: bool = False) -> None:
+        await self.collection.replace_one(
+            {"_id": block["hash"]},
+            {"_id": block["hash"], **block, "waiting": waiting},
+            upsert=True
+        )
+
+    def _rollback_to(self, parent_hash: str) -> List[str]:
+        """Drop buffered blocks built on top of `parent_hash`, returning their hashes"""
+        if parent_hash not in self.blocks:
+            if self.finalized and self.finalized["hash"] == parent_hash:
+                dropped = list(self.blocks)
+                self.blocks.clear()
+                return dropped
+            raise DeepReorgError(
+                f"Parent {parent_hash} is neither buffered nor the finalized block"
+            )
+
+        dropped = []
+        while next(reversed(self.blocks)) != parent_hash:
+            dropped.append(self.blocks.popitem(last=True)[0])
+        return dropped
+
+    async def _finalize_oldest(self) -> None:
+        block_hash, block = self.blocks.popitem(last=False)
+        events = [
+            {**event, "block_number": block["number"], "block_hash": block_hash}
+            for event in block["events"]
+        ]
+        if events:
+            await apply_events(events)
+
+        self.finalized = {
+            "_id": "finalized",
+            "number": block["number"],
+            "hash": block_hash,
+            "updated_at": datetime.utcnow(),
+        }
+        await database.db.chain_sync.replace_one({"_id": "finalized"}, self.finalized, upsert=True)
+        # Also removes blocks left behind by a consumer that stopped mid-way
+        await self.collection.delete_many({"number": {"$lte": block["number"]}})
+        for stale in [h for h, b in self.waiting.items() if b["number"] <= block["number"]]:
+            del self.waiting[stale]
+
+    async def _request_backfill(self, block: Dict[str, Any]) -> None:
+        """Record the missing range before `block` for the provider to resend"""
+        start = self.head["number"] + 1
+        end = min(b["number"] for b in self.waiting.values()) - 1
+        self.backfill = {"_id": "backfill", "from_block": start, "to_block": end, "requested_at": datetime.utcnow()}
+        await database.db.chain_sync.replace_one({"_id": "backfill"}, self.backfill, upsert=True)
+        logger.warning(f"Gap before block {block['number']}: requesting a backfill of blocks {start}-{end}")
+
+    async def _buffer(self, block: Dict[str, Any], result: Dict[str, int]) -> None:
+        head = self.head
+        if head and block["parent_hash"] != head["hash"]:
+            parent = self.blocks.get(block["parent_hash"]) or (
+                self.finalized if self.finalized and self.finalized["hash"] == block["parent_hash"] else None
+            )
+            if parent is None and block["number"] > head["number"] + 1:
+                self.waiting[block["hash"]] = block
+                await self._store(block, waiting=True)
+                await self._request_backfill(block)
+                result["waiting"] += 1
+                return
+            if parent is not None and block["number"] != parent["number"] + 1:
+                raise ValueError(f"Block {block['number']} does not follow its parent {parent['number']}")
+
+            dropped = self._rollback_to(block["parent_hash"])
+            if dropped:
+                await self.collection.delete_many({"_id": {"$in": dropped}})
+                result["dropped"] += len(dropped)
+                self.reorgs += 1
+                await database.db.chain_sync.update_one({"_id": "reorgs"}, {"$inc": {"count": 1}}, upsert=True)
+                logger.warning(f"Reorg at block {block['number']}: dropped {len(dropped)} orphaned blocks")
+
+        self.blocks[block["hash"]] = block
+        await self._store(block)
+
+        while len(self.blocks) > self.confirmations:
+            await self._finalize_oldest()
+            result["finalized"] += 1
+
+    async def add_block(self, raw_block: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Buffer a block, rolling back orphaned blocks and finalizing confirmed ones
+        Returns counts of dropped, finalized and waiting blocks
+        """
+        block = self._normalize_block(raw_block)
+        result = {"dropped": 0, "finalized": 0, "waiting": 0}
+
+        async with self._lock:
+            if block["hash"] in self.blocks or block["hash"] in self.waiting:
+                return result
+            if self.finalized and block["number"] <= self.finalized["number"]:
+                return result
+
+            await self._buffer(block, result)
+
+            # Blocks that were waiting for this one can follow it now
+            while self.waiting:
+                head_hash = self.head["hash"]
+                child = next((b for b in self.waiting.values() if b["parent_hash"] == head_hash), None)
+                if child is None:
+                    break
+                del self.waiting[child["hash"]]
+                await self._buffer(child, result)
+
+            if self.backfill and not self.waiting:
+                self.backfill = None
+                await database.db.chain_sync.delete_one({"_id": "backfill"})
+                logger.info(f"Backfill complete at block {self.head['number']}")
+
+        return result
+
+    async def add_blocks(self, raw_blocks: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Buffer several blocks in order"""
+        totals = {"dropped": 0, "finalized": 0, "waiting": 0}
+        for raw_block in sorted(raw_blocks, key=lambda b: int(b["number"])):
+            result = await self.add_block(raw_block)
+            for key, value in result.items():
+                totals[key] += value
+        return totals
+
+    async def persisted(self) -> "ConfirmationBuffer":
+        """The buffer as last stored, as seen by processes other than its consumer"""
+        buffer = ConfirmationBuffer(self.confirmations)
+        await buffer.load_cursor()
+        return buffer
+
+    def pending_events(self) -> List[Dict[str, Any]]:
+        """Unconfirmed events of the buffered blocks, oldest first"""
+        return [
+            {**normalize_event({**event, "block_number": block["number"], "block_hash": block["hash"]}),
+             "confirmed": False}
+            for block in self.blocks.values()
+            for event in block["events"]
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        head = self.head
+        return {
+            "buffered_blocks": len(self.blocks),
+            "confirmations": self.confirmations,
+            "head_block": head["number"] if head else None,
+            "finalized_block": self.finalized["number"] if self.finalized else None,
+            "waiting_blocks": len(self.waiting),
+            "backfill": {k: self.backfill[k] for k in ("from_block", "to_block")} if self.backfill else None,
+            "reorgs": self.reorgs,
+        }
+
+confirmation_buffer = ConfirmationBuffer(settings.chain_confirmations)
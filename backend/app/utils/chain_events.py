@@ -0,0 +1,100 @@
+import importlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.utils.db_guard import db_guard
+from app.utils.logging import get_logger
+
+logger = get_logger("blockchain.events")
+
+# A projection receives every event for its contract in chain order
+Projection = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+# Modules that register projections on import
+PROJECTION_MODULES = [
+    "app.utils.reputation",
+    "app.utils.token_ledger",
+    "app.utils.mentor_directory",
+]
+
+# Registered projections keyed by contract name
+_projections: Dict[str, List[Tuple[Tuple[str, ...], Projection]]] = {}
+_projections_loaded = False
+
+def register_projection(contract: str, *event_names: str):
+    """
+    Register a projection for events emitted by a contract
+
+    The decorated coroutine is called with the matching events of a batch,
+    in (block_number, log_index) order.
+    """
+    def decorator(func: Projection) -> Projection:
+        _projections.setdefault(contract, []).append((event_names, func))
+        return func
+    return decorator
+
+def load_projections() -> None:
+    """Import the projection modules so their handlers are registered"""
+    global _projections_loaded
+    
+    if _projections_loaded:
+        return
+    
+    for module in PROJECTION_MODULES:
+        importlib.import_module(module)
+    _projections_loaded = True
+
+def normalize_address(address: Optional[str]) -> Optional[str]:
+    """Lowercase an address so it can be used as a lookup key"""
+    return address.lower() if address else address
+
+def normalize_event(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize a decoded log into the shape projections expect
+
+    Accepts both the camelCase keys produced by web3 log decoding
+    and the snake_case keys used internally.
+    """
+    return {
+        "contract": raw["contract"],
+        "event": raw["event"],
+        "args": raw.get("args", {}),
+        "tx_hash": (raw.get("tx_hash") or raw.get("transactionHash") or "").lower(),
+        "log_index": int(raw.get("log_index", raw.get("logIndex", 0))),
+        "block_number": int(raw.get("block_number", raw.get("blockNumber", 0))),
+        "block_hash": raw.get("block_hash") or raw.get("blockHash"),
+    }
+
+def event_key(event: Dict[str, Any]) -> str:
+    """Unique key of a log, used for idempotent application"""
+    return f"{event['tx_hash']}:{event['log_index']}"
+
+async def apply_events(raw_events: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Apply a batch of decoded contract events to the registered projections
+    Returns the number of events handed to projections per contract
+    """
+    load_projections()
+    
+    events = sorted(
+        (normalize_event(raw) for raw in raw_events),
+        key=lambda e: (e["block_number"], e["log_index"])
+    )
+
+    by_contract: Dict[str, List[Dict[str, Any]]] = {}
+    for event in events:
+        by_contract.setdefault(event["contract"], []).append(event)
+
+    applied: Dict[str, int] = {}
+    for contract, contract_events in by_contract.items():
+        projections = _projections.get(contract)
+        if not projections:
+            logger.warning(f"No projection registered for contract: {contract}")
+            continue
+
+        for event_names, projection in projections:
+            matching = [e for e in contract_events if not event_names or e["event"] in event_names]
+            if matching:
+                await db_guard.run("background", lambda: projection(matching))
+                applied[contract] = applied.get(contract, 0) + len(matching)
+
+    return applied
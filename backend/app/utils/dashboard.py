@@ -0,0 +1,122 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.config import database
+from app.config.settings import get_settings
+from app.utils.active_users import active_user_tracker
+from app.utils.db_guard import db_guard
+from app.utils.db_indexes import get_collection_stats
+from app.utils.logging import get_logger
+
+settings = get_settings()
+logger = get_logger("dashboard")
+
+class DashboardSnapshot:
+    """
+    Admin dashboard statistics computed in the background
+
+    Every `dashboard_refresh_seconds` the totals are read from collection
+    metadata (estimated_document_count), the daily user counts from a
+    single $facet aggregation and the active user windows from the
+    HyperLogLog sketches. Requests are answered from the last snapshot
+    with its age, so loading the dashboard costs no database work.
+    """
+
+    def __init__(self):
+        self.data: Optional[Dict[str, Any]] = None
+        self.generated_at: Optional[datetime] = None
+        self._generated_monotonic = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._refresh: Optional[asyncio.Future] = None
+
+    async def _compute(self) -> Dict[str, Any]:
+        db = database.db
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        # The leading $match narrows the facets to today's users through the
+        # last_active and created_at indexes instead of scanning the collection
+        daily_users, total_users, total_sessions, active_users = await db_guard.gather("admin_analytics", [
+            lambda: db.users.aggregate([
+                {"$match": {"$or": [{"last_active": {"$gte": today}}, {"created_at": {"$gte": today}}]}},
+                {"$facet": {
+                    "active_today": [{"$match": {"last_active": {"$gte": today}}}, {"$count": "count"}],
+                    "new_today": [{"$match": {"created_at": {"$gte": today}}}, {"$count": "count"}],
+                }}
+            ]).to_list(length=1),
+            db.users.estimated_document_count,
+            db.sessions.estimated_document_count,
+            active_user_tracker.counts
+        ])
+        # Guards each of its queries itself
+        db_stats = await get_collection_stats()
+
+        facets = daily_users[0] if daily_users else {}
+        def facet_count(name: str) -> int:
+            return facets[name][0]["count"] if facets.get(name) else 0
+
+        return {
+            "users": {
+                "total": total_users,
+                "active_today": facet_count("active_today"),
+                "new_today": facet_count("new_today"),
+                "dau": active_users["dau"],
+                "wau": active_users["wau"],
+                "mau": active_users["mau"]
+            },
+            "sessions": {
+                "total": total_sessions
+            },
+            "database": {
+                "collections": len(db_stats),
+                "details": db_stats
+            },
+            "system": {
+                "environment": settings.environment,
+                "version": "1.0.0"
+            }
+        }
+
+    async def _do_refresh(self) -> None:
+        try:
+            self.data = await self._compute()
+            self.generated_at = datetime.utcnow()
+            self._generated_monotonic = time.monotonic()
+        except Exception as e:
+            logger.error(f"Dashboard refresh failed: {str(e)}", exc_info=True)
+
+    async def refresh(self) -> None:
+        """Recompute the snapshot, joining a refresh already in progress"""
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.ensure_future(self._do_refresh())
+        await asyncio.shield(self._refresh)
+
+    async def get(self) -> Dict[str, Any]:
+        """The latest snapshot with its generation time and age"""
+        if self.data is None:
+            # Not computed yet (first request after startup)
+            await self.refresh()
+
+        return {
+            **(self.data or {}),
+            "generated_at": self.generated_at,
+            "age_seconds": round(time.monotonic() - self._generated_monotonic, 1) if self.generated_at else None
+        }
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(settings.dashboard_refresh_seconds)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+dashboard_snapshot = DashboardSnapshot()
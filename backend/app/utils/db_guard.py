@@ -0,0 +1,348 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Iterable, List, NamedTuple, Optional, TypeVar
+
+from fastapi import HTTPException, status
+from pymongo.errors import ConnectionFailure, ExecutionTimeout
+
+from app.config.settings import get_settings
+from app.utils.logging import get_logger
+from app.utils.metrics import metrics_registry
+
+settings = get_settings()
+logger = get_logger("database.guard")
+
+T = TypeVar("T")
+
+class Workload(NamedTuple):
+    """Limits for one class of database work"""
+    name: str
+    max_concurrency: int  # Database calls in flight, including ones past their deadline
+    timeout_ms: float  # Deadline of a single call
+    queue_timeout_ms: float  # Longest wait for a free slot before failing
+
+# The caps add up to the connection pool size (maxPoolSize 50). A slot
+# stands for one connection, so a guarded operation runs its driver calls
+# one after another and fans out only through MongoGuard.gather, which
+# guards each branch. Calls outside the guard (webhook intake, leases,
+# health checks, the chain buffer) are single short operations on top.
+WORKLOADS: Dict[str, Workload] = {
+    "auth": Workload("auth", 20, 2000, 500),
+    "user_reads": Workload("user_reads", 22, 3000, 500),
+    "admin_analytics": Workload("admin_analytics", 4, 60000, 5000),
+    "background": Workload("background", 4, 60000, 30000),
+}
+
+# Errors that say the database is unhealthy, as opposed to a bad query
+BREAKER_ERRORS = (ConnectionFailure, ExecutionTimeout, asyncio.TimeoutError)
+
+class DatabaseUnavailable(HTTPException):
+    """Raised when a database call is refused or fails fast; served as 503"""
+
+    def __init__(self, workload: str, reason: str):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database is busy or unavailable, please try again shortly",
+            headers={"Retry-After": str(int(settings.mongo_breaker_cooldown_seconds))}
+        )
+        self.workload = workload
+        self.reason = reason
+
+class Bulkhead:
+    """
+    Concurrency limit with a bounded wait for a free slot
+
+    Released slots are handed directly to the oldest waiter, so a waiter
+    that gives up can never leak a slot it was handed at the same moment.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: float) -> bool:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return True
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=timeout)
+        except asyncio.CancelledError:
+            if waiter.done():
+                self.release()
+            else:
+                self._give_up(waiter)
+            raise
+        if waiter.done():
+            return True
+        self._give_up(waiter)
+        return False
+
+    def _give_up(self, waiter: asyncio.Future) -> None:
+        waiter.cancel()
+        self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot passes to the waiter, so in_flight stays the same
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+class CircuitBreaker:
+    """
+    Fails fast while the recent error rate of a workload is too high
+
+    Outcomes are counted in one-second buckets over `window_seconds`. Once
+    at least `min_calls` calls fail at `failure_rate` or more, the breaker
+    opens and refuses calls for `cooldown_seconds`; then a single probe
+    call is let through, which closes the breaker on success or opens it
+    again on failure.
+    """
+
+    def __init__(self, failure_rate: float, min_calls: int, window_seconds: int, cooldown_seconds: float):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.state = "closed"
+        self.opened_count = 0
+        self._buckets: Deque[List[int]] = deque()  # [second, calls, failures]
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.cooldown_seconds:
+                return False
+            self.state = "half_open"
+            self._probe_in_flight = False
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def record(self, failed: bool, probe: bool = False) -> None:
+        if probe:
+            self._probe_in_flight = False
+            if failed:
+                self._open()
+            else:
+                self.state = "closed"
+                self._buckets.clear()
+            return
+        if self.state != "closed":
+            # Calls admitted before the breaker opened
+            return
+
+        now = int(time.monotonic())
+        if self._buckets and self._buckets[-1][0] == now:
+            bucket = self._buckets[-1]
+        else:
+            bucket = [now, 0, 0]
+            self._buckets.append(bucket)
+        bucket[1] += 1
+        bucket[2] += failed
+        while self._buckets[0][0] <= now - self.window_seconds:
+            self._buckets.popleft()
+
+        if failed:
+            calls = sum(b[1] for b in self._buckets)
+            failures = sum(b[2] for b in self._buckets)
+            if calls >= self.min_calls and failures / calls >= self.failure_rate:
+                self._open()
+
+    def abandon_probe(self) -> None:
+        """Let another call probe when the probe never reached the database"""
+        self._probe_in_flight = False
+
+    def _open(self) -> None:
+        self.state = "open"
+        self.opened_count += 1
+        self._opened_at = time.monotonic()
+        self._buckets.clear()
+
+    def error_rate(self) -> float:
+        calls = sum(b[1] for b in self._buckets)
+        return round(sum(b[2] for b in self._buckets) / calls, 3) if calls else 0.0
+
+class WorkloadGuard:
+    """Bulkhead, circuit breaker and counters of one workload"""
+
+    def __init__(self, workload: Workload):
+        self.workload = workload
+        self.bulkhead = Bulkhead(workload.max_concurrency)
+        self.breaker = CircuitBreaker(
+            settings.mongo_breaker_failure_rate,
+            settings.mongo_breaker_min_calls,
+            settings.mongo_breaker_window_seconds,
+            settings.mongo_breaker_cooldown_seconds
+        )
+        self.counts: Dict[str, int] = {"rejected": 0, "short_circuited": 0, "deadline_exceeded": 0, "served_stale": 0}
+
+class MongoGuard:
+    """
+    Data access wrapper isolating database workloads from each other
+
+    Each workload gets a bulkhead (a concurrency cap with a bounded queue),
+    a deadline per call and its own circuit breaker, so one workload timing
+    out cannot trip another. A call past its deadline returns to its caller
+    immediately, but keeps its slot until the driver actually finishes:
+    Motor runs operations on executor threads that cannot be cancelled, and
+    freeing the slot early would let a slow workload pile up more of them.
+
+    Calls given a `cache_key` remember their last result, which is served
+    instead of an error while the database is failing.
+    """
+
+    def __init__(self, workloads: Dict[str, Workload]):
+        self.guards = {name: WorkloadGuard(workload) for name, workload in workloads.items()}
+        self._stale: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._last_log = 0.0
+
+    async def run(
+        self,
+        workload: str,
+        operation: Callable[[], Awaitable[T]],
+        cache_key: Optional[Hashable] = None
+    ) -> T:
+        """Run `operation` (a callable returning the awaitable) under a workload's limits"""
+        if not settings.mongo_guard_enabled:
+            return await operation()
+
+        guard = self.guards[workload]
+        if not guard.breaker.allow():
+            return self._refuse(guard, "short_circuited", cache_key)
+        probe = guard.breaker.state == "half_open"
+
+        if not await guard.bulkhead.acquire(guard.workload.queue_timeout_ms / 1000):
+            if probe:
+                guard.breaker.abandon_probe()
+            metrics_registry.inc("mongodb_bulkhead_rejections_total")
+            return self._refuse(guard, "rejected", cache_key)
+
+        try:
+            task = asyncio.ensure_future(operation())
+        except BaseException:
+            guard.bulkhead.release()
+            if probe:
+                guard.breaker.abandon_probe()
+            raise
+        task.add_done_callback(lambda finished: self._finished(guard, finished))
+
+        try:
+            result = await asyncio.wait_for(asyncio.shield(task), guard.workload.timeout_ms / 1000)
+        except BREAKER_ERRORS as e:
+            guard.breaker.record(True, probe)
+            if isinstance(e, asyncio.TimeoutError):
+                guard.counts["deadline_exceeded"] += 1
+                metrics_registry.inc("mongodb_deadline_exceeded_total")
+            return self._refuse(guard, type(e).__name__, cache_key, e)
+        except asyncio.CancelledError:
+            # The caller went away; the call itself says nothing about the database
+            if probe:
+                guard.breaker.abandon_probe()
+            raise
+        except Exception:
+            # Query errors (validation, duplicate keys) mean the database answered
+            guard.breaker.record(False, probe)
+            raise
+
+        guard.breaker.record(False, probe)
+        if cache_key is not None:
+            self._remember(cache_key, result)
+        return result
+
+    async def gather(
+        self,
+        workload: str,
+        operations: Iterable[Callable[[], Awaitable[T]]],
+        limit: Optional[int] = None
+    ) -> List[T]:
+        """
+        Run operations concurrently, each under the workload's limits
+
+        At most `limit` (by default the workload's cap) run or wait for a
+        slot at once, so a wide fan-out queues here rather than timing out
+        in the bulkhead queue.
+        """
+        cap = self.guards[workload].workload.max_concurrency
+        semaphore = asyncio.Semaphore(min(limit or cap, cap))
+
+        async def guarded(operation: Callable[[], Awaitable[T]]) -> T:
+            async with semaphore:
+                return await self.run(workload, operation)
+
+        return list(await asyncio.gather(*(guarded(operation) for operation in operations)))
+
+    def _finished(self, guard: WorkloadGuard, task: asyncio.Future) -> None:
+        guard.bulkhead.release()
+        # Retrieve the outcome of calls abandoned at their deadline so asyncio
+        # does not report it as never retrieved
+        if not task.cancelled():
+            task.exception()
+
+    def _remember(self, key: Hashable, value: Any) -> None:
+        self._stale[key] = value
+        self._stale.move_to_end(key)
+        while len(self._stale) > settings.mongo_stale_cache_size:
+            self._stale.popitem(last=False)
+
+    def _refuse(
+        self,
+        guard: WorkloadGuard,
+        reason: str,
+        cache_key: Optional[Hashable],
+        error: Optional[BaseException] = None
+    ) -> Any:
+        name = guard.workload.name
+        if reason in guard.counts:
+            guard.counts[reason] += 1
+        if reason == "short_circuited":
+            metrics_registry.inc("mongodb_breaker_rejections_total")
+
+        now = time.monotonic()
+        if now - self._last_log > 10:
+            logger.warning(
+                f"Database call refused for {name}: {reason}, breaker {guard.breaker.state}, "
+                f"{guard.bulkhead.in_flight} in flight"
+            )
+            self._last_log = now
+
+        if cache_key is not None and cache_key in self._stale:
+            guard.counts["served_stale"] += 1
+            return self._stale[cache_key]
+        raise DatabaseUnavailable(name, reason) from error
+
+    def stats(self) -> Dict[str, Any]:
+        """Bulkhead occupancy, breaker state and refusal counts per workload"""
+        return {
+            "enabled": settings.mongo_guard_enabled,
+            "workloads": {
+                name: {
+                    "max_concurrency": guard.workload.max_concurrency,
+                    "timeout_ms": guard.workload.timeout_ms,
+                    "in_flight": guard.bulkhead.in_flight,
+                    "waiting": guard.bulkhead.waiting,
+                    "breaker": guard.breaker.state,
+                    "breaker_opened": guard.breaker.opened_count,
+                    "error_rate": guard.breaker.error_rate(),
+                    **guard.counts
+                }
+                for name, guard in self.guards.items()
+            },
+            "stale_cache_entries": len(self._stale),
+        }
+
+db_guard = MongoGuard(WORKLOADS)
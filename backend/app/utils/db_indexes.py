@@ -1,133 +1,392 @@
-from typing import List, Dict, Any
+import asyncio
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
 
-from app.config.database import db
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+from app.config import database
+from app.utils.db_guard import db_guard, DatabaseUnavailable
 from app.utils.logging import get_logger
+from app.utils.query_shapes import query_shape, percentile
+from app.config.settings import get_settings
+
+settings = get_settings()
 
 logger = get_logger("database.indexes")
 
+IndexKeys = List[Tuple[str, Any]]
+
+# Index definitions per collection: key fields plus creation options
+INDEX_DEFINITIONS: Dict[str, List[Dict[str, Any]]] = {
+    "users": [
+        {"keys": [("email", 1)], "unique": True},
+        {"keys": [("username", 1)], "unique": True},
+        {"keys": [("role", 1)]},
+        {"keys": [("created_at", 1)]},
+        {"keys": [("last_active", 1)]},
+    ],
+    "sessions": [
+        {"keys": [("user_id", 1)]},
+        {"keys": [("created_at", 1)]},
+        {"keys": [("expires_at", 1)]},
+    ],
+    # Skills collection indexes (assuming a skills collection)
+    "skills": [
+        {"keys": [("name", 1)]},
+        {"keys": [("category", 1)]},
+    ],
+    # User skills association indexes (assuming a user_skills collection)
+    "user_skills": [
+        {"keys": [("user_id", 1), ("skill_id", 1)], "unique": True},
+    ],
+    # Reviews collection indexes (assuming a reviews collection)
+    "reviews": [
+        {"keys": [("user_id", 1)]},
+        {"keys": [("reviewer_id", 1)]},
+        {"keys": [("skill_id", 1)]},
+        {"keys": [("rating", 1)]},
+    ],
+    "transactions": [
+        {"keys": [("user_id", 1)]},
+        {"keys": [("type", 1)]},
+        {"keys": [("status", 1)]},
+        {"keys": [("created_at", 1)]},
+        {"keys": [("tx_hash", 1)], "sparse": True},
+    ],
+    # Notifications collection indexes (assuming a notifications collection)
+    "notifications": [
+        {"keys": [("user_id", 1)]},
+        {"keys": [("read", 1)]},
+        {"keys": [("created_at", 1)]},
+    ],
+    # Webhook queue indexes
+    "webhook_queue": [
+        {"keys": [("source", 1), ("status", 1), ("available_at", 1), ("created_at", 1)]},
+        {"keys": [("claim", 1)], "sparse": True},
+    ],
+    "webhook_dead_letter": [
+        {"keys": [("source", 1), ("failed_at", -1)]},
+    ],
+    "webhook_events": [
+        {"keys": [("created_at", 1)], "expireAfterSeconds": settings.webhook_dedup_retention_days * 86400},
+    ],
+    # Mentor reputation projection indexes
+    "mentor_reputation": [
+        {"keys": [("average_rating", -1), ("rating_count", -1), ("_id", 1)]},
+    ],
+    "mentor_ratings": [
+        {"keys": [("mentor", 1)]},
+    ],
+    # Token ledger and balance projection indexes
+    "token_ledger": [
+        {"keys": [("parties", 1), ("block_number", -1), ("log_index", -1)]},
+        {"keys": [("tx_hash", 1), ("log_index", 1)], "unique": True},
+    ],
+    "token_balances": [
+        {"keys": [("balance", -1)]},
+    ],
+    "slow_query_snapshots": [
+        {"keys": [("taken_at", -1)], "expireAfterSeconds": 30 * 86400},
+    ],
+    # Daily active user sketches, kept for a little over a year
+    "active_user_sketches": [
+        {"keys": [("updated_at", 1)], "expireAfterSeconds": 400 * 86400},
+    ],
+    # Mentor directory projection indexes
+    "mentor_directory": [
+        {"keys": [("active", 1), ("hourly_rate", 1), ("_id", 1)]},
+        {"keys": [("skill_tags", 1), ("active", 1), ("hourly_rate", 1)]},
+    ],
+}
+
+# Options that change what an index does; anything else (name, version) is ignored
+FINGERPRINT_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+def _normalize_keys(keys: Any) -> Tuple[Tuple[str, Any], ...]:
+    # list_indexes returns directions as floats or ints depending on the server
+    return tuple(
+        (field, int(direction) if isinstance(direction, (int, float)) else direction)
+        for field, direction in (keys.items() if hasattr(keys, "items") else keys)
+    )
+
+def index_fingerprint(spec: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Comparable form of an index definition or of a list_indexes entry"""
+    options = tuple(
+        (option, repr(spec[option])) for option in FINGERPRINT_OPTIONS
+        if spec.get(option) not in (None, False)
+    )
+    return (_normalize_keys(spec.get("keys", spec.get("key"))), options)
+
+async def _sync_collection_indexes(name: str, definitions: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Create the indexes of one collection that are missing, in one command"""
+    collection = database.db[name]
+    existing = await collection.list_indexes().to_list(length=None)
+    existing_fingerprints = {index_fingerprint(index) for index in existing}
+    existing_by_keys = {_normalize_keys(index["key"]): index for index in existing}
+
+    missing: List[IndexModel] = []
+    for definition in definitions:
+        if index_fingerprint(definition) in existing_fingerprints:
+            continue
+
+        keys = _normalize_keys(definition["keys"])
+        current = existing_by_keys.get(keys)
+        options = {k: v for k, v in definition.items() if k != "keys"}
+        if current is not None:
+            if set(options) == {"expireAfterSeconds"} and "expireAfterSeconds" in current:
+                # A changed TTL can be updated in place
+                await database.db.command(
+                    "collMod", name,
+                    index={"keyPattern": current["key"], "expireAfterSeconds": options["expireAfterSeconds"]}
+                )
+                logger.info(f"Updated TTL of index {current['name']} on {name}")
+            else:
+                logger.warning(
+                    f"Index {current['name']} on {name} differs from its definition {options}; "
+                    f"drop it to have it recreated"
+                )
+            continue
+
+        missing.append(IndexModel(list(keys), **options))
+
+    if missing:
+        await collection.create_indexes(missing)
+    return {"created": len(missing), "existing": len(definitions) - len(missing)}
+
 async def create_indexes() -> bool:
     """
     Create all required indexes for the database
     Returns True if successful, False otherwise
+    
+    Indexes that already match their definition are not sent again, and
+    collections are handled concurrently.
     """
     try:
-        # Users collection indexes
-        await db.users.create_index("email", unique=True)
-        await db.users.create_index("username", unique=True)
-        await db.users.create_index("role")
-        await db.users.create_index("created_at")
-        await db.users.create_index("last_active")
-        
-        # Sessions collection indexes
-        await db.sessions.create_index("user_id")
-        await db.sessions.create_index("created_at")
-        await db.sessions.create_index("expires_at")
-        
-        # Skills collection indexes (assuming a skills collection)
-        await db.skills.create_index("name")
-        await db.skills.create_index("category")
+        results = await asyncio.gather(*(
+            _sync_collection_indexes(name, definitions)
+            for name, definitions in INDEX_DEFINITIONS.items()
+        ))
         
-        # User skills association indexes (assuming a user_skills collection)
-        await db.user_skills.create_index([("user_id", 1), ("skill_id", 1)], unique=True)
-        
-        # Reviews collection indexes (assuming a reviews collection)
-        await db.reviews.create_index("user_id")
-        await db.reviews.create_index("reviewer_id")
-        await db.reviews.create_index("skill_id")
-        await db.reviews.create_index("rating")
-        
-        # Transactions collection indexes (assuming a transactions collection)
-        await db.transactions.create_index("user_id")
-        await db.transactions.create_index("type")
-        await db.transactions.create_index("status")
-        await db.transactions.create_index("created_at")
-        
-        # Notifications collection indexes (assuming a notifications collection)
-        await db.notifications.create_index("user_id")
-        await db.notifications.create_index("read")
-        await db.notifications.create_index("created_at")
-        
-        logger.info("Successfully created database indexes")
+        created = sum(r["created"] for r in results)
+        existing = sum(r["existing"] for r in results)
+        logger.info(f"Database indexes ready: {created} created, {existing} already present")
         return True
         
     except Exception as e:
         logger.error(f"Error creating database indexes: {str(e)}", exc_info=True)
         return False
 
-async def get_collection_stats() -> List[Dict[str, Any]]:
-    """
-    Get statistics about collections and their indexes
-    """
+async def _storage_stats(collection_name: str) -> Dict[str, Any]:
+    """Storage statistics of a collection, via $collStats where the server supports it"""
+    try:
+        result = await database.db[collection_name].aggregate(
+            [{"$collStats": {"storageStats": {}}}]
+        ).to_list(length=1)
+        if result:
+            return result[0].get("storageStats", {})
+    except OperationFailure:
+        pass
+    # Older servers and some hosted tiers only offer the command
+    return await database.db.command("collStats", collection_name)
+
+async def _single_collection_stats(collection_name: str) -> Optional[Dict[str, Any]]:
+    # One call at a time: this runs in a single admin_analytics slot
+    try:
+        collection_stats = await _storage_stats(collection_name)
+        indexes = await database.db[collection_name].index_information()
+    except OperationFailure as e:
+        # Views and collections dropped meanwhile have no stats
+        logger.warning(f"Skipping stats for {collection_name}: {str(e)}")
+        return None
+    
+    return {
+        "collection": collection_name,
+        "count": collection_stats.get("count", 0),
+        "size_mb": round(collection_stats.get("size", 0) / (1024 * 1024), 2),
+        "avg_obj_size_bytes": collection_stats.get("avgObjSize", 0),
+        "indexes": len(indexes),
+        "index_size_mb": round(collection_stats.get("totalIndexSize", 0) / (1024 * 1024), 2),
+        "index_details": [
+            {
+                "name": name,
+                "keys": info.get("key", {}),
+                "unique": info.get("unique", False),
+                "sparse": info.get("sparse", False),
+                "expire_after_seconds": info.get("expireAfterSeconds"),
+                "partial_filter": info.get("partialFilterExpression"),
+                "size_mb": round(collection_stats.get("indexSizes", {}).get(name, 0) / (1024 * 1024), 2)
+            }
+            for name, info in indexes.items()
+        ]
+    }
+
+async def _load_collection_stats() -> Optional[List[Dict[str, Any]]]:
     try:
         # Get list of collections
-        collections = await db.list_collection_names()
-        stats = []
+        collections = await db_guard.run("admin_analytics", database.db.list_collection_names)
         
-        for collection_name in collections:
-            # Get collection stats
-            collection_stats = await db.command("collStats", collection_name)
-            
-            # Get indexes for the collection
-            indexes = await db[collection_name].index_information()
-            
-            stats.append({
-                "collection": collection_name,
-                "count": collection_stats.get("count", 0),
-                "size_mb": round(collection_stats.get("size", 0) / (1024 * 1024), 2),
-                "avg_obj_size_bytes": collection_stats.get("avgObjSize", 0),
-                "indexes": len(indexes),
-                "index_size_mb": round(collection_stats.get("totalIndexSize", 0) / (1024 * 1024), 2),
-                "index_details": [
-                    {
-                        "name": name,
-                        "keys": info.get("key", {}),
-                        "unique": info.get("unique", False)
-                    }
-                    for name, info in indexes.items()
-                ]
-            })
-            
+        results = await db_guard.gather(
+            "admin_analytics",
+            [lambda name=name: _single_collection_stats(name) for name in sorted(collections)],
+            settings.collection_stats_concurrency
+        )
+        stats = [r for r in results if r is not None]
+        
+        _collection_stats_cache["data"] = stats
+        _collection_stats_cache["expires_at"] = time.monotonic() + settings.collection_stats_ttl_seconds
         return stats
         
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Error getting collection stats: {str(e)}", exc_info=True)
+        return None
+
+# Last collection stats and the refresh in progress, shared by all callers
+_collection_stats_cache: Dict[str, Any] = {"data": None, "expires_at": 0.0}
+_collection_stats_refresh: Optional[asyncio.Future] = None
+
+async def get_collection_stats(refresh: bool = False) -> List[Dict[str, Any]]:
+    """
+    Get statistics about collections and their indexes
+    
+    Collections are queried concurrently (at most `collection_stats_concurrency`
+    at a time, each in its own admin_analytics slot) and the result is cached for `collection_stats_ttl_seconds`.
+    Callers arriving while a refresh runs wait for that refresh instead of
+    starting their own.
+    """
+    global _collection_stats_refresh
+    
+    if not refresh and _collection_stats_cache["data"] is not None \
+            and time.monotonic() < _collection_stats_cache["expires_at"]:
+        return _collection_stats_cache["data"]
+    
+    if _collection_stats_refresh is None or _collection_stats_refresh.done():
+        _collection_stats_refresh = asyncio.ensure_future(_load_collection_stats())
+    
+    # Shielded so a caller that disconnects does not cancel the refresh for the others
+    stats = await asyncio.shield(_collection_stats_refresh)
+    return stats if stats is not None else []
+
+async def get_profile_entries(limit: int = 1000) -> List[Dict[str, Any]]:
+    """
+    Most recent query entries of the system.profile collection
+    Returns an empty list when profiling is not enabled
+    """
+    # Check if profiling is enabled
+    profiling_status = await database.db.command("profile", -1)
+    current_level = profiling_status.get("was", 0)
+    
+    if current_level == 0:
+        logger.warning("MongoDB profiling is not enabled. Enable with db.setProfilingLevel(1, {slowms: 100})")
         return []
+    
+    return await database.db.system.profile.find(
+        {"op": {"$in": ["query", "command", "count", "distinct", "update", "remove"]}},
+        sort=[("ts", -1)],
+        limit=limit
+    ).to_list(length=limit)
 
-async def analyze_slow_queries() -> List[Dict[str, Any]]:
+def _window_minutes(entries: List[Dict[str, Any]]) -> float:
+    timestamps = [e["ts"] for e in entries if isinstance(e.get("ts"), datetime)]
+    if len(timestamps) < 2:
+        return 1.0
+    return max((max(timestamps) - min(timestamps)).total_seconds() / 60, 1.0)
+
+async def analyze_slow_queries(limit: int = 1000, save_snapshot: bool = False) -> Dict[str, Any]:
     """
     Analyze slow queries from the system.profile collection
     Requires MongoDB profiling to be enabled
+    
+    Profile entries are grouped into query shapes (literal values replaced
+    by placeholders) and ranked by total time, so a frequent moderately
+    slow query outranks a single pathological one. Each shape is compared
+    with the last saved snapshot; rates per minute are compared because
+    the profile collection is capped and windows overlap.
     """
     try:
-        # Check if profiling is enabled
-        profiling_status = await db.command("profile", -1)
-        current_level = profiling_status.get("was", 0)
+        entries = await get_profile_entries(limit)
+        window_minutes = _window_minutes(entries)
         
-        if current_level == 0:
-            logger.warning("MongoDB profiling is not enabled. Enable with db.setProfilingLevel(1, {slowms: 100})")
-            return []
+        shapes: Dict[str, Dict[str, Any]] = {}
+        durations: Dict[str, List[float]] = {}
+        for entry in entries:
+            shape = query_shape(entry)
+            if shape is None:
+                continue
+            
+            aggregate = shapes.get(shape["id"])
+            if aggregate is None:
+                aggregate = shapes[shape["id"]] = {
+                    **shape,
+                    "count": 0,
+                    "total_ms": 0,
+                    "docs_examined": 0,
+                    "keys_examined": 0,
+                    "returned": 0,
+                    "plan": entry.get("planSummary"),
+                }
+                durations[shape["id"]] = []
+            
+            millis = entry.get("millis", 0)
+            aggregate["count"] += 1
+            aggregate["total_ms"] += millis
+            aggregate["docs_examined"] += entry.get("docsExamined", 0)
+            aggregate["keys_examined"] += entry.get("keysExamined", 0)
+            aggregate["returned"] += entry.get("nreturned", 0)
+            durations[shape["id"]].append(millis)
         
-        # Query the system.profile collection for slow queries
-        slow_queries = await db.system.profile.find(
-            {"op": {"$in": ["query", "update", "remove"]}},
-            sort=[("millis", -1)],
-            limit=20
-        ).to_list(length=20)
+        for shape_id, aggregate in shapes.items():
+            values = sorted(durations[shape_id])
+            aggregate["p50_ms"] = percentile(values, 0.5)
+            aggregate["p95_ms"] = percentile(values, 0.95)
+            aggregate["max_ms"] = values[-1]
+            aggregate["examined_per_returned"] = round(
+                aggregate["docs_examined"] / max(aggregate["returned"], 1), 1
+            )
+            aggregate["calls_per_min"] = round(aggregate["count"] / window_minutes, 3)
+            aggregate["ms_per_min"] = round(aggregate["total_ms"] / window_minutes, 3)
         
-        # Process and return the results
-        return [
-            {
-                "operation": q.get("op"),
-                "namespace": q.get("ns"),
-                "query": q.get("query", q.get("command", {})),
-                "duration_ms": q.get("millis"),
-                "timestamp": q.get("ts"),
-                "client": q.get("client"),
-                "user": q.get("user")
-            }
-            for q in slow_queries
-        ]
+        ranked = sorted(shapes.values(), key=lambda s: s["total_ms"], reverse=True)
+        
+        # Trend against the previous snapshot
+        previous = await database.db.slow_query_snapshots.find_one(sort=[("taken_at", -1)])
+        previous_shapes = {s["id"]: s for s in previous["shapes"]} if previous else {}
+        for aggregate in ranked:
+            before = previous_shapes.get(aggregate["id"])
+            if not previous:
+                aggregate["trend"] = None
+            elif before is None:
+                aggregate["trend"] = {"new": True}
+            else:
+                aggregate["trend"] = {
+                    "new": False,
+                    "calls_per_min_change": round(aggregate["calls_per_min"] - before["calls_per_min"], 3),
+                    "ms_per_min_change": round(aggregate["ms_per_min"] - before["ms_per_min"], 3),
+                    "p95_ms_change": aggregate["p95_ms"] - before["p95_ms"],
+                }
+        
+        taken_at = datetime.utcnow()
+        if save_snapshot:
+            await database.db.slow_query_snapshots.insert_one({
+                "taken_at": taken_at,
+                "window_minutes": window_minutes,
+                "shapes": [
+                    {key: s[key] for key in ("id", "collection", "operation", "calls_per_min", "ms_per_min", "p95_ms")}
+                    for s in ranked
+                ]
+            })
+        
+        return {
+            "entries": len(entries),
+            "window_minutes": round(window_minutes, 1),
+            "compared_to": previous["taken_at"] if previous else None,
+            "snapshot_saved": taken_at if save_snapshot else None,
+            "shapes": ranked
+        }
         
     except Exception as e:
         logger.error(f"Error analyzing slow queries: {str(e)}", exc_info=True)
-        return [] 
\ No newline at end of file
+        return {"entries": 0, "shapes": []}
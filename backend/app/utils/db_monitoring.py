@@ -0,0 +1,153 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from app.utils.metrics import metrics_registry, bucket_quantile
+
+def _collection_of(event: monitoring.CommandStartedEvent) -> str:
+    """Collection a command runs on; most commands name it in their first field"""
+    target = event.command.get(event.command_name)
+    if isinstance(target, str):
+        return target
+    # getMore carries the cursor ID first and the collection separately
+    collection = event.command.get("collection")
+    return collection if isinstance(collection, str) else ""
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Records the latency of every MongoDB command by command and collection
+
+    The collection is only known from the started event, so it is held by
+    request ID until the command completes.
+    """
+
+    def __init__(self):
+        self._collections: Dict[int, str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        self._collections[event.request_id] = _collection_of(event)
+
+    def _observe(self, event: Any, status: str) -> None:
+        collection = self._collections.pop(event.request_id, "")
+        metrics_registry.observe(
+            "mongodb_command_duration_seconds",
+            (event.command_name, collection, status),
+            event.duration_micros / 1_000_000
+        )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._observe(event, "ok")
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._observe(event, "failed")
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Tracks connection pool size, checked out connections, checkout wait
+    time and checkout timeouts per server
+
+    A checkout starts and completes on the same thread, so the wait is
+    measured with a thread-local start time.
+    """
+
+    def __init__(self):
+        self.servers: Dict[str, Dict[str, int]] = {}
+        self._checkout = threading.local()
+
+    def _server(self, address: Tuple[str, int]) -> Dict[str, int]:
+        key = f"{address[0]}:{address[1]}"
+        server = self.servers.get(key)
+        if server is None:
+            server = self.servers[key] = {"size": 0, "in_use": 0, "checkout_timeouts": 0, "cleared": 0}
+        return server
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        self._server(event.address)
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        self._server(event.address)["cleared"] += 1
+        metrics_registry.inc("mongodb_pool_cleared_total")
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        pass
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        self._server(event.address)["size"] += 1
+        metrics_registry.inc("mongodb_pool_connections")
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        self._server(event.address)["size"] -= 1
+        metrics_registry.inc("mongodb_pool_connections", -1)
+
+    def connection_check_out_started(self, event: monitoring.ConnectionCheckOutStartedEvent) -> None:
+        self._checkout.started = time.perf_counter()
+
+    def _checkout_wait(self) -> None:
+        started = getattr(self._checkout, "started", None)
+        if started is not None:
+            metrics_registry.observe("mongodb_pool_checkout_seconds", (), time.perf_counter() - started)
+            self._checkout.started = None
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        self._checkout_wait()
+        if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+            self._server(event.address)["checkout_timeouts"] += 1
+            metrics_registry.inc("mongodb_pool_checkout_timeouts_total")
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        self._checkout_wait()
+        self._server(event.address)["in_use"] += 1
+        metrics_registry.inc("mongodb_pool_in_use")
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        self._server(event.address)["in_use"] -= 1
+        metrics_registry.inc("mongodb_pool_in_use", -1)
+
+command_metrics = CommandMetrics()
+pool_metrics = PoolMetrics()
+
+def _latency_summary(counts: List[int], total_seconds: float) -> Dict[str, Any]:
+    count = sum(counts)
+    summary: Dict[str, Any] = {"count": count}
+    if count:
+        summary["avg_ms"] = round(total_seconds / count * 1000, 3)
+        for name, q in (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+            # Bucket upper bounds, so within one log-linear step of the true value
+            summary[name] = round(bucket_quantile(counts, q) * 1000, 3)
+    return summary
+
+def get_pool_stats(max_pool_size: Optional[int] = None) -> Dict[str, Any]:
+    """Connection pool state and checkout latency of this process"""
+    checkout = metrics_registry.histograms["mongodb_pool_checkout_seconds"].get(())
+    servers = {address: dict(server) for address, server in pool_metrics.servers.items()}
+    if max_pool_size:
+        for server in servers.values():
+            server["utilization"] = round(server["in_use"] / max_pool_size, 3)
+
+    return {
+        "servers": servers,
+        "checkout_wait": _latency_summary(checkout.counts, checkout.sum) if checkout else {"count": 0},
+    }
+
+def get_command_stats() -> List[Dict[str, Any]]:
+    """Latency per command and collection in this process, slowest p95 first"""
+    stats = []
+    for (command, collection, status), histogram in list(
+        metrics_registry.histograms["mongodb_command_duration_seconds"].items()
+    ):
+        stats.append({
+            "command": command,
+            "collection": collection,
+            "status": status,
+            **_latency_summary(histogram.counts, histogram.sum)
+        })
+    stats.sort(key=lambda s: s.get("p95_ms", 0), reverse=True)
+    return stats
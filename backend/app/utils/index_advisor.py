@@ -0,0 +1,201 @@
+from typing import Any, Dict, List, Tuple
+
+from pymongo.errors import OperationFailure
+
+from app.config import database
+from app.utils.db_guard import db_guard
+from app.utils.db_indexes import get_collection_stats, get_profile_entries
+from app.utils.logging import get_logger
+from app.utils.query_shapes import extract_query
+
+logger = get_logger("database.index_advisor")
+
+# Query operators that make a field a range predicate rather than an equality
+RANGE_OPERATORS = {"$gt", "$gte", "$lt", "$lte", "$ne", "$nin", "$exists", "$regex", "$not", "$type"}
+
+# Single-field indexes with this few distinct values in a sample rarely narrow a query
+LOW_SELECTIVITY_DISTINCT = 5
+SELECTIVITY_SAMPLE_SIZE = 1000
+
+Keys = Tuple[Tuple[str, Any], ...]
+
+def filter_fields(query: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    """Fields of a filter split into equality and range predicates, in order"""
+    equality: List[str] = []
+    ranges: List[str] = []
+    for field, value in query.items():
+        if field == "$and" and isinstance(value, list):
+            for clause in value:
+                eq, rng = filter_fields(clause)
+                equality.extend(f for f in eq if f not in equality)
+                ranges.extend(f for f in rng if f not in ranges)
+        elif field.startswith("$"):
+            # $or, $expr and friends need one index per branch; not advised on
+            continue
+        elif isinstance(value, dict) and any(op in RANGE_OPERATORS for op in value):
+            if field not in ranges:
+                ranges.append(field)
+        elif field not in equality:
+            equality.append(field)
+    return equality, [f for f in ranges if f not in equality]
+
+def recommend_keys(query: Dict[str, Any], sort: Dict[str, Any]) -> Keys:
+    """Compound index for a query shape: equality fields, then sort, then range (ESR)"""
+    equality, ranges = filter_fields(query)
+    keys: List[Tuple[str, Any]] = [(field, 1) for field in equality]
+    seen = set(equality)
+    for field, direction in sort.items():
+        if field not in seen:
+            keys.append((field, direction))
+            seen.add(field)
+    keys.extend((field, 1) for field in ranges if field not in seen)
+    return tuple(keys)
+
+def _normalize(keys: Any) -> Keys:
+    items = keys.items() if hasattr(keys, "items") else keys
+    return tuple((field, int(d) if isinstance(d, (int, float)) else d) for field, d in items)
+
+def _is_prefix(short: Keys, long: Keys) -> bool:
+    return len(short) < len(long) and long[:len(short)] == short
+
+def _covers(index_keys: Keys, wanted: Keys) -> bool:
+    """Whether an index serves a query shape: its leading keys are the wanted keys"""
+    if len(index_keys) < len(wanted):
+        return False
+    return [f for f, _ in index_keys[:len(wanted)]] == [f for f, _ in wanted]
+
+def _is_special(index: Dict[str, Any]) -> bool:
+    """TTL, partial and sparse indexes, whose keys alone do not say what they are for"""
+    return index.get("expire_after_seconds") is not None or bool(index.get("partial_filter")) or index.get("sparse", False)
+
+async def _index_usage(collection: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        stats = await database.db[collection].aggregate([{"$indexStats": {}}]).to_list(length=None)
+    except OperationFailure as e:
+        logger.warning(f"$indexStats unavailable for {collection}: {str(e)}")
+        return {}
+    return {
+        s["name"]: {"ops": int(s.get("accesses", {}).get("ops", 0)), "since": s.get("accesses", {}).get("since")}
+        for s in stats
+    }
+
+async def _distinct_in_sample(collection: str, field: str) -> int:
+    result = await database.db[collection].aggregate([
+        {"$sample": {"size": SELECTIVITY_SAMPLE_SIZE}},
+        {"$group": {"_id": f"${field}"}},
+        {"$count": "distinct"}
+    ]).to_list(length=1)
+    return result[0]["distinct"] if result else 0
+
+async def _analyze_collection(collection: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    # Runs in one admin_analytics slot, so its queries go one at a time
+    name = collection["collection"]
+    usage = await _index_usage(name)
+    indexes = {
+        index["name"]: {**index, "keys": _normalize(index["keys"])}
+        for index in collection["index_details"]
+    }
+    findings: Dict[str, List[Dict[str, Any]]] = {"unused": [], "redundant": [], "low_selectivity": []}
+
+    for index_name, index in indexes.items():
+        if index_name == "_id_":
+            continue
+        keys = index["keys"]
+        entry = {
+            "collection": name,
+            "index": index_name,
+            "keys": [list(k) for k in keys],
+            "size_mb": index.get("size_mb", 0),
+        }
+
+        # Unique indexes enforce a constraint even when no query uses them.
+        # TTL deletes are not counted as accesses, and a partial or sparse
+        # index covers different documents than a full one on the same keys,
+        # so neither kind is reported as removable.
+        special = _is_special(index)
+        index_usage = usage.get(index_name)
+        if index_usage is not None and index_usage["ops"] == 0 and not index["unique"] and not special:
+            findings["unused"].append({**entry, "since": index_usage["since"]})
+
+        for other_name, other in indexes.items():
+            if other_name == index_name or index["unique"] or special or _is_special(other):
+                continue
+            if _is_prefix(keys, other["keys"]):
+                findings["redundant"].append({**entry, "reason": "prefix", "covered_by": other_name})
+                break
+            if keys == other["keys"] and index_name > other_name:
+                findings["redundant"].append({**entry, "reason": "duplicate", "covered_by": other_name})
+                break
+
+        if len(keys) == 1 and not index["unique"] and keys[0][0] != "_id":
+            distinct = await _distinct_in_sample(name, keys[0][0])
+            if 0 < distinct <= LOW_SELECTIVITY_DISTINCT:
+                findings["low_selectivity"].append({**entry, "distinct_values_in_sample": distinct})
+
+    return findings
+
+async def build_index_report(profile_limit: int = 1000) -> Dict[str, Any]:
+    """
+    Index usage report from $indexStats, the profiler and index sizes
+
+    Lists unused indexes (no accesses since the server started tracking),
+    indexes made redundant by a duplicate or by a compound index they are a
+    prefix of, low-selectivity single-field indexes, and compound indexes
+    recommended for profiled query shapes that no index serves.
+    """
+    collections = [c for c in await get_collection_stats() if not c["collection"].startswith("system.")]
+    per_collection = await db_guard.gather(
+        "admin_analytics",
+        [lambda collection=collection: _analyze_collection(collection) for collection in collections]
+    )
+
+    report: Dict[str, Any] = {"unused": [], "redundant": [], "low_selectivity": [], "recommended": []}
+    for findings in per_collection:
+        for kind, items in findings.items():
+            report[kind].extend(items)
+
+    # Group profiled queries by the index they would want
+    existing = {
+        c["collection"]: [_normalize(i["keys"]) for i in c["index_details"]]
+        for c in collections
+    }
+    try:
+        entries = await db_guard.run("admin_analytics", lambda: get_profile_entries(profile_limit))
+    except OperationFailure as e:
+        logger.warning(f"Profiler data unavailable: {str(e)}")
+        entries = []
+
+    shapes: Dict[Tuple[str, Keys], Dict[str, Any]] = {}
+    for entry in entries:
+        query = extract_query(entry)
+        if query is None:
+            continue
+        collection, filter_doc, sort = query
+        wanted = recommend_keys(filter_doc, sort)
+        if not wanted or any(_covers(keys, wanted) for keys in existing.get(collection, [])):
+            continue
+
+        shape = shapes.setdefault((collection, wanted), {
+            "collection": collection,
+            "keys": [list(k) for k in wanted],
+            "queries": 0,
+            "total_ms": 0,
+            "docs_examined": 0,
+            "returned": 0,
+            "plans": set(),
+        })
+        shape["queries"] += 1
+        shape["total_ms"] += entry.get("millis", 0)
+        shape["docs_examined"] += entry.get("docsExamined", 0)
+        shape["returned"] += entry.get("nreturned", 0)
+        if entry.get("planSummary"):
+            shape["plans"].add(entry["planSummary"])
+
+    report["recommended"] = sorted(
+        ({**s, "plans": sorted(s["plans"])} for s in shapes.values()),
+        key=lambda s: s["total_ms"],
+        reverse=True
+    )
+    removable = {(i["collection"], i["index"]): i["size_mb"] for i in report["unused"] + report["redundant"]}
+    report["removable_index_mb"] = round(sum(removable.values()), 2)
+    return report
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.config import database
+from app.config.settings import get_settings
+from app.utils.logging import get_logger
+
+settings = get_settings()
+logger = get_logger("leases")
+
+class MongoLease:
+    """
+    Exclusive, expiring ownership of a named role across processes
+
+    The lease is a document in the leases collection naming its owner and
+    expiry. It is taken when free or expired and kept by renewing it well
+    before it expires; an owner that dies simply stops renewing.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    @property
+    def collection(self):
+        return database.db.leases
+
+    async def acquire(self) -> bool:
+        now = datetime.utcnow()
+        try:
+            await self.collection.find_one_and_update(
+                {"_id": self.name, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {
+                    "owner": self.owner,
+                    "expires_at": now + timedelta(seconds=self.ttl_seconds),
+                    "renewed_at": now,
+                }},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return True
+        except DuplicateKeyError:
+            # Held by another live owner: the filter missed and the upsert collided
+            return False
+
+    async def renew(self) -> bool:
+        """Extend the lease; False if it was lost to another owner"""
+        now = datetime.utcnow()
+        doc = await self.collection.find_one_and_update(
+            {"_id": self.name, "owner": self.owner},
+            {"$set": {"expires_at": now + timedelta(seconds=self.ttl_seconds), "renewed_at": now}}
+        )
+        return doc is not None
+
+    async def release(self) -> None:
+        await self.collection.delete_one({"_id": self.name, "owner": self.owner})
+
+class LeaderTask:
+    """
+    Runs a coroutine in exactly one process at a time
+
+    Every process competes for the lease; the holder runs `work` and renews
+    the lease every third of its lifetime. If a renewal fails, or cannot
+    reach the database before the lease could have expired, the work is
+    cancelled so two processes never run it at once.
+    """
+
+    def __init__(self, lease: MongoLease, work: Callable[[], Awaitable[None]]):
+        self.lease = lease
+        self.work = work
+        self.is_leader = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def _lead(self) -> None:
+        interval = self.lease.ttl_seconds / 3
+        renewed = time.monotonic()
+        task = asyncio.create_task(self.work())
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=interval)
+                if done:
+                    # The work should run until cancelled; surface why it stopped
+                    task.result()
+                    logger.warning(f"Work under lease {self.lease.name} returned")
+                    return
+                try:
+                    if not await self.lease.renew():
+                        logger.warning(f"Lost lease {self.lease.name} to another process")
+                        return
+                    renewed = time.monotonic()
+                except Exception as e:
+                    if time.monotonic() - renewed > self.lease.ttl_seconds - interval:
+                        logger.error(f"Could not renew lease {self.lease.name}, stepping down: {str(e)}")
+                        return
+                    logger.warning(f"Renewing lease {self.lease.name} failed: {str(e)}")
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                acquired = await self.lease.acquire()
+            except Exception as e:
+                logger.warning(f"Acquiring lease {self.lease.name} failed: {str(e)}")
+                acquired = False
+
+            if acquired:
+                logger.info(f"Acquired lease {self.lease.name} as {self.lease.owner}")
+                self.is_leader = True
+                try:
+                    await self._lead()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Work under lease {self.lease.name} failed: {str(e)}", exc_info=True)
+                finally:
+                    self.is_leader = False
+
+            await asyncio.sleep(self.lease.ttl_seconds / 3)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            # Hand over immediately instead of waiting for the lease to expire
+            try:
+                await self.lease.release()
+            except Exception as e:
+                logger.warning(f"Releasing lease {self.lease.name} failed: {str(e)}")
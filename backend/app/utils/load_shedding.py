@@ -0,0 +1,136 @@
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from app.config.settings import get_settings
+from app.utils.logging import get_logger
+from app.utils.rate_limit import PolicyTable
+
+settings = get_settings()
+logger = get_logger("load_shedding")
+
+class RouteClass(NamedTuple):
+    """How requests matched by a route pattern share the concurrency limit"""
+    name: str
+    share: float  # Fraction of the adaptive limit this class may fill
+    latency_target_ms: float  # Slower responses count as overload
+    max_concurrency: Optional[int] = None  # Fixed cap on top of the adaptive limit
+    exempt: bool = False
+
+# (method, path prefix, class); "*" matches any method and the longest
+# matching prefix wins. Lower shares are shed first as the service fills
+# up, so auth keeps working while bulk and admin traffic backs off.
+TARGET_MS = settings.load_shed_latency_target_ms
+ROUTE_CLASSES: List[Tuple[str, str, RouteClass]] = [
+    ("*", "/", RouteClass("default", 0.9, TARGET_MS)),
+    # Health checks never touch the database; shedding them would make
+    # load balancers pull a node that is only busy
+    ("*", "/health", RouteClass("health", 1.0, TARGET_MS, exempt=True)),
+    ("*", "/metrics", RouteClass("health", 1.0, TARGET_MS, exempt=True)),
+    # Password hashing makes auth slower than other routes
+    ("POST", "/api/auth/login", RouteClass("auth", 1.0, TARGET_MS * 2)),
+    ("POST", "/api/auth/register", RouteClass("auth", 1.0, TARGET_MS * 2)),
+    ("POST", "/api/auth/refresh", RouteClass("auth", 1.0, TARGET_MS)),
+    ("*", "/api/admin", RouteClass("admin", 0.5, TARGET_MS * 10, max_concurrency=10)),
+    ("*", "/api/blockchain/sync", RouteClass("admin", 0.5, TARGET_MS * 10, max_concurrency=10)),
+]
+
+class AIMDLimiter:
+    """
+    Adaptive concurrency limit using additive increase, multiplicative decrease
+
+    While responses stay under their latency target and the limit is
+    actually being used, it grows by about one request per full round of
+    completions. A slow response or an overload status (503/504) shrinks it
+    by `backoff`. Requests admitted before the last decrease were running
+    under the old limit, so their completions do not shrink it again.
+    """
+
+    def __init__(self, initial: int, min_limit: int, max_limit: int, backoff: float = 0.9):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.in_flight = 0
+        self._last_decrease = 0.0
+
+    def try_acquire(self, share: float = 1.0) -> bool:
+        if self.in_flight >= max(int(self.limit * share), 1):
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self, started: float, latency_ms: float, target_ms: float, overloaded: bool = False) -> None:
+        in_flight = self.in_flight
+        self.in_flight -= 1
+
+        if overloaded or latency_ms > target_ms:
+            if started >= self._last_decrease:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = time.monotonic()
+        elif in_flight * 2 >= self.limit:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+class LoadShedder:
+    """
+    Admission control in front of the request handlers
+
+    Instead of queueing behind the MongoDB connection pool, requests over
+    the adaptive limit (or their route class cap) are refused immediately
+    so the ones admitted stay within their latency target.
+    """
+
+    def __init__(self, route_classes: List[Tuple[str, str, RouteClass]]):
+        self.limiter = AIMDLimiter(
+            settings.load_shed_initial_limit,
+            settings.load_shed_min_limit,
+            settings.load_shed_max_limit
+        )
+        self.classes: PolicyTable[RouteClass] = PolicyTable(route_classes)
+        self.class_in_flight: Dict[str, int] = {}
+        self.shed_counts: Dict[str, int] = {}
+        self._last_shed_log = 0.0
+
+    def match(self, method: str, path: str) -> Optional[RouteClass]:
+        return self.classes.match(method, path)
+
+    def try_acquire(self, route_class: RouteClass) -> bool:
+        name = route_class.name
+        in_flight = self.class_in_flight.get(name, 0)
+        if (route_class.max_concurrency is not None and in_flight >= route_class.max_concurrency) \
+                or not self.limiter.try_acquire(route_class.share):
+            self._shed(name)
+            return False
+        self.class_in_flight[name] = in_flight + 1
+        return True
+
+    def release(self, route_class: RouteClass, started: float, overloaded: bool = False) -> None:
+        self.class_in_flight[route_class.name] -= 1
+        self.limiter.release(
+            started,
+            (time.monotonic() - started) * 1000,
+            route_class.latency_target_ms,
+            overloaded
+        )
+
+    def _shed(self, name: str) -> None:
+        self.shed_counts[name] = self.shed_counts.get(name, 0) + 1
+
+        now = time.monotonic()
+        if now - self._last_shed_log > 10:
+            logger.warning(
+                f"Shedding load: limit {int(self.limiter.limit)}, {self.limiter.in_flight} in flight, "
+                f"shed so far {self.shed_counts}"
+            )
+            self._last_shed_log = now
+
+    def stats(self) -> Dict[str, Any]:
+        """Current adaptive limit, in-flight requests and shed counts per route class"""
+        return {
+            "enabled": settings.load_shedding_enabled,
+            "limit": int(self.limiter.limit),
+            "in_flight": self.limiter.in_flight,
+            "in_flight_by_class": dict(self.class_in_flight),
+            "shed": dict(self.shed_counts),
+        }
+
+load_shedder = LoadShedder(ROUTE_CLASSES)
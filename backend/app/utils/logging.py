@@ -1,10 +1,15 @@
-import os
-import json
+import atexit
 import logging
+import queue
+import threading
+import time
 import traceback
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+import orjson
 
 from app.config.settings import get_settings
 
@@ -13,20 +18,30 @@ settings = get_settings()
 # Create logs directory if it doesn't exist
 Path("logs").mkdir(exist_ok=True)
 
+# Record attributes copied into the JSON output when set via `extra`
+EXTRA_FIELDS = ("request_id", "user_id", "duration_ms", "path", "method", "status_code", "unsampled")
+
 # Configure logger
 class JSONFormatter(logging.Formatter):
     """
     Formatter that outputs JSON strings after parsing the log record.
+    Fields that are the same for every record are computed once.
     """
+    def __init__(self):
+        super().__init__()
+        self.static_fields = {"environment": settings.environment}
+
     def format(self, record: logging.LogRecord) -> str:
+        # Records are formatted by the listener thread, so the timestamp
+        # comes from the record rather than the clock
         log_record = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": datetime.utcfromtimestamp(record.created).isoformat(),
             "level": record.levelname,
             "name": record.name,
             "message": record.getMessage(),
-            "environment": settings.environment,
+            **self.static_fields
         }
-        
+
         # Add exception info if available
         if record.exc_info:
             log_record["exception"] = {
@@ -34,47 +49,132 @@ class JSONFormatter(logging.Formatter):
                 "message": str(record.exc_info[1]),
                 "traceback": traceback.format_exception(*record.exc_info)
             }
-            
+
         # Add extra fields
-        if hasattr(record, "request_id"):
-            log_record["request_id"] = record.request_id
-            
-        if hasattr(record, "user_id"):
-            log_record["user_id"] = record.user_id
-            
-        if hasattr(record, "duration_ms"):
-            log_record["duration_ms"] = record.duration_ms
-            
-        if hasattr(record, "path"):
-            log_record["path"] = record.path
-            
-        if hasattr(record, "method"):
-            log_record["method"] = record.method
-            
-        if hasattr(record, "status_code"):
-            log_record["status_code"] = record.status_code
-        
-        return json.dumps(log_record)
+        record_fields = record.__dict__
+        for field in EXTRA_FIELDS:
+            if field in record_fields:
+                log_record[field] = record_fields[field]
+
+        return orjson.dumps(log_record, default=str).decode()
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread without blocking the caller
+
+    When the bounded queue is full the record is dropped and counted; the
+    count is logged, at most once a second, once the queue has room again.
+    """
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._reported = 0
+        self._last_report = 0.0
+        self._lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only merge the message arguments here; JSON encoding and traceback
+        # formatting happen on the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return
+
+        if self.dropped > self._reported and time.monotonic() - self._last_report >= 1:
+            with self._lock:
+                self._last_report = time.monotonic()
+                missed = self.dropped - self._reported
+                self._reported = self.dropped
+            notice = logging.makeLogRecord({
+                "name": "logging",
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": f"Dropped {missed} log records because the log queue was full"
+            })
+            try:
+                self.queue.put_nowait(notice)
+            except queue.Full:
+                pass
+
+_queue_handler: Optional[DroppingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+_setup_lock = threading.Lock()
+
+def _build_sinks() -> List[logging.Handler]:
+    formatter = JSONFormatter()
+
+    # Add console handler
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+    sinks: List[logging.Handler] = [console_handler]
+
+    # Add file handler
+    if settings.log_file_path:
+        file_handler = logging.FileHandler(settings.log_file_path)
+        file_handler.setFormatter(formatter)
+        sinks.append(file_handler)
+
+    return sinks
+
+def _get_queue_handler() -> DroppingQueueHandler:
+    """Create the shared queue handler and start its listener on first use"""
+    global _queue_handler, _listener
+    if _queue_handler is None:
+        with _setup_lock:
+            if _queue_handler is None:
+                log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=settings.log_queue_size)
+                _listener = QueueListener(log_queue, *_build_sinks(), respect_handler_level=True)
+                _listener.start()
+                # Flush what is still queued when the process exits
+                atexit.register(shutdown_logging)
+                _queue_handler = DroppingQueueHandler(log_queue)
+    return _queue_handler
+
+def shutdown_logging() -> None:
+    """Stop the listener thread after writing out queued records"""
+    global _listener
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except queue.Full:
+            # No room for the stop sentinel; the thread is a daemon and
+            # exits with the process
+            pass
+        _listener = None
+
+def get_log_stats() -> Dict[str, Any]:
+    """Depth of the log queue and records dropped since startup"""
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped
+    }
 
 def get_logger(name: str) -> logging.Logger:
     """
     Get a configured logger instance
+
+    All loggers share one queue handler; a single listener thread formats
+    records and writes them to the console and log file.
     """
     logger = logging.getLogger(name)
-    
+
     # Set log level based on settings
     log_level = getattr(logging, settings.log_level.upper(), logging.INFO)
     logger.setLevel(log_level)
-    
-    # Add console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(JSONFormatter())
-    logger.addHandler(console_handler)
-    
-    # Add file handler
-    if settings.log_file_path:
-        file_handler = logging.FileHandler(settings.log_file_path)
-        file_handler.setFormatter(JSONFormatter())
-        logger.addHandler(file_handler)
-    
-    return logger 
\ No newline at end of file
+
+    handler = _get_queue_handler()
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
+        # Records are written by the shared sinks only once
+        logger.propagate = False
+
+    return logger
@@ -0,0 +1,168 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson.decimal128 import Decimal128
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.config import database
+from app.utils.chain_events import register_projection, normalize_address
+from app.utils.logging import get_logger
+from app.utils.token_ledger import event_position
+
+logger = get_logger("blockchain.mentors")
+
+DUPLICATE_KEY_ERROR = 11000
+
+def _profile_fields(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields of the directory entry set by a single MentorRegistry event"""
+    args = event["args"]
+    name = event["event"]
+
+    if name in ("MentorRegistered", "MentorUpdated"):
+        fields = {
+            "name": args["name"],
+            "hourly_rate": Decimal128(str(int(args["hourlyRate"]))),
+        }
+        # Skills and metadata are not part of the event; indexers that decode
+        # the transaction input can pass them along with the event args
+        if args.get("skills") is not None:
+            fields["skills"] = list(args["skills"])
+            fields["skill_tags"] = sorted({s.strip().lower() for s in args["skills"]})
+        if args.get("metadataURI") is not None:
+            fields["metadata_uri"] = args["metadataURI"]
+        if name == "MentorRegistered":
+            fields["active"] = True
+            fields["registered_block"] = event["block_number"]
+        return fields
+
+    return {"active": name == "MentorReactivated"}
+
+@register_projection(
+    "MentorRegistry",
+    "MentorRegistered", "MentorUpdated", "MentorDeactivated", "MentorReactivated"
+)
+async def project_mentor_events(events: List[Dict[str, Any]]) -> None:
+    """Apply MentorRegistry events to the mentor_directory collection"""
+    mentors = {normalize_address(event["args"]["mentorAddress"]) for event in events}
+    stored = {
+        doc["_id"]: doc.get("last_position", -1)
+        async for doc in database.db.mentor_directory.find(
+            {"_id": {"$in": list(mentors)}},
+            projection={"last_position": 1}
+        )
+    }
+
+    # Fold each mentor's events into one update so the batch can be written
+    # unordered. Events at or below the stored position were applied before;
+    # on a partial replay they would overwrite newer fields, so they are left out.
+    folded: Dict[str, Tuple[Dict[str, Any], int]] = {}
+    for event in sorted(events, key=lambda e: (e["block_number"], e["log_index"])):
+        mentor = normalize_address(event["args"]["mentorAddress"])
+        position = event_position(event["block_number"], event["log_index"])
+        if position <= stored.get(mentor, -1):
+            continue
+        fields, _ = folded.get(mentor, ({}, 0))
+        fields.update(_profile_fields(event))
+        folded[mentor] = (fields, position)
+
+    now = datetime.utcnow()
+    operations = []
+    for mentor, (fields, position) in folded.items():
+        update: Dict[str, Any] = {"$set": {**fields, "last_position": position, "updated_at": now}}
+        if "skills" not in fields:
+            update["$setOnInsert"] = {"skills": [], "skill_tags": []}
+        
+        # Entries that already absorbed a later event do not match; the
+        # resulting upsert collides on _id and is ignored below
+        operations.append(UpdateOne(
+            {"_id": mentor, "last_position": {"$lt": position}},
+            update,
+            upsert=True
+        ))
+
+    if not operations:
+        logger.info(f"Skipped {len(events)} already projected mentor events")
+        return
+
+    try:
+        await database.db.mentor_directory.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+            raise
+        logger.info(f"Skipped {len(errors)} stale mentor directory updates")
+
+def _format_mentor(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "address": doc["_id"],
+        "name": doc.get("name"),
+        "skills": doc.get("skills", []),
+        "hourly_rate": str(doc["hourly_rate"].to_decimal()) if doc.get("hourly_rate") else None,
+        "active": doc.get("active", False),
+        "metadata_uri": doc.get("metadata_uri"),
+        "updated_at": doc.get("updated_at"),
+    }
+
+def _parse_cursor(cursor: str) -> Tuple[Decimal128, str]:
+    rate, address = cursor.split(":", 1)
+    return Decimal128(rate), address
+
+async def search_mentors(
+    skill: Optional[str] = None,
+    min_rate: Optional[int] = None,
+    max_rate: Optional[int] = None,
+    include_inactive: bool = False,
+    descending: bool = False,
+    limit: int = 20,
+    cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Filter mentors by skill and hourly rate, ordered by rate
+
+    Pages are keyed on (hourly_rate, address); pass the returned
+    `next_cursor` to continue from the last mentor of a page.
+    """
+    query: Dict[str, Any] = {}
+    if not include_inactive:
+        query["active"] = True
+    if skill:
+        query["skill_tags"] = skill.strip().lower()
+
+    rate_range: Dict[str, Any] = {}
+    if min_rate is not None:
+        rate_range["$gte"] = Decimal128(str(min_rate))
+    if max_rate is not None:
+        rate_range["$lte"] = Decimal128(str(max_rate))
+    if rate_range:
+        query["hourly_rate"] = rate_range
+
+    direction = -1 if descending else 1
+    if cursor:
+        rate, address = _parse_cursor(cursor)
+        past = "$lt" if descending else "$gt"
+        query["$or"] = [
+            {"hourly_rate": {past: rate}},
+            {"hourly_rate": rate, "_id": {past: address}},
+        ]
+
+    docs = await database.db.mentor_directory.find(
+        query,
+        sort=[("hourly_rate", direction), ("_id", direction)],
+        limit=limit
+    ).to_list(length=limit)
+
+    next_cursor = None
+    if len(docs) == limit:
+        last = docs[-1]
+        next_cursor = f"{last['hourly_rate'].to_decimal()}:{last['_id']}"
+
+    return {
+        "mentors": [_format_mentor(doc) for doc in docs],
+        "next_cursor": next_cursor
+    }
+
+async def get_mentor(address: str) -> Optional[Dict[str, Any]]:
+    """Directory entry of a single mentor"""
+    doc = await database.db.mentor_directory.find_one({"_id": normalize_address(address)})
+    return _format_mentor(doc) if doc else None
@@ -0,0 +1,236 @@
+import asyncio
+import os
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+from app.config.settings import get_settings
+from app.utils.logging import get_logger
+
+settings = get_settings()
+logger = get_logger("metrics")
+
+def log_linear_buckets(low_exponent: int, high_exponent: int) -> List[float]:
+    """Bucket bounds 1..9 x 10^e for each decade, e.g. 0.001, 0.002 ... 0.009, 0.01, 0.02 ..."""
+    return [
+        round(step * 10 ** exponent, 10)
+        for exponent in range(low_exponent, high_exponent + 1)
+        for step in range(1, 10)
+    ]
+
+# 100 microseconds to 90 seconds
+LATENCY_BUCKETS = log_linear_buckets(-4, 1)
+
+# Label names of each histogram; label values are passed as a tuple in this order
+HISTOGRAMS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "http_request_duration_seconds": ("HTTP request latency", ("method", "route", "status")),
+    "mongodb_command_duration_seconds": ("MongoDB command latency", ("command", "collection", "status")),
+    "mongodb_pool_checkout_seconds": ("Time spent waiting for a pooled MongoDB connection", ()),
+}
+GAUGES: Dict[str, str] = {
+    "http_requests_in_flight": "HTTP requests being processed",
+    "mongodb_pool_connections": "Open MongoDB connections",
+    "mongodb_pool_in_use": "MongoDB connections checked out",
+}
+COUNTERS: Dict[str, str] = {
+    "mongodb_pool_checkout_timeouts_total": "Pooled MongoDB connection checkouts that timed out",
+    "mongodb_pool_cleared_total": "MongoDB connection pools cleared after errors",
+    "mongodb_bulkhead_rejections_total": "Database calls refused because their workload was at its concurrency cap",
+    "mongodb_breaker_rejections_total": "Database calls refused by an open circuit breaker",
+    "mongodb_deadline_exceeded_total": "Database calls abandoned at their workload deadline",
+    "chain_deep_reorgs_total": "Blockchain deliveries rejected because a reorg reached below the finalized block",
+}
+
+class Histogram:
+    """Bucket counts in a preallocated list; the last slot is +Inf"""
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, size: int):
+        self.counts = [0] * (size + 1)
+        self.sum = 0.0
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th quantile"""
+        return bucket_quantile(self.counts, q)
+
+    def observe(self, value: float) -> None:
+        # Plain increments without a lock: updates from the event loop never
+        # interleave, and a rare lost increment from a driver thread is an
+        # acceptable price for keeping the hot path cheap
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+
+def bucket_quantile(counts: List[int], q: float) -> Optional[float]:
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    cumulative = 0
+    for bound, count in zip(LATENCY_BUCKETS, counts):
+        cumulative += count
+        if cumulative >= rank:
+            return bound
+    return float("inf")
+
+class MetricsRegistry:
+    """
+    In-process histograms and gauges with Prometheus text exposition
+
+    With several workers, each one periodically writes a snapshot of its
+    metrics to `metrics_dir`; the worker answering a scrape merges its
+    live metrics with the snapshots of the others.
+    """
+
+    def __init__(self, metrics_dir: Optional[str] = None):
+        self.histograms: Dict[str, Dict[Tuple[str, ...], Histogram]] = {name: {} for name in HISTOGRAMS}
+        self.gauges: Dict[str, float] = {name: 0 for name in GAUGES}
+        self.counters: Dict[str, float] = {name: 0 for name in COUNTERS}
+        self.metrics_dir = Path(metrics_dir) if metrics_dir else None
+        self._task: Optional[asyncio.Task] = None
+
+    def observe(self, name: str, labels: Tuple[str, ...], value: float) -> None:
+        series = self.histograms[name]
+        histogram = series.get(labels)
+        if histogram is None:
+            histogram = series[labels] = Histogram(len(LATENCY_BUCKETS))
+        histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1) -> None:
+        """Change a gauge or increment a counter"""
+        if name in self.counters:
+            self.counters[name] += amount
+        else:
+            self.gauges[name] += amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "histograms": {
+                name: [[list(labels), list(h.counts), h.sum] for labels, h in series.items()]
+                for name, series in self.histograms.items()
+            },
+            "gauges": dict(self.gauges),
+            "counters": dict(self.counters),
+        }
+
+    @staticmethod
+    def merge(snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+        histograms: Dict[str, Dict[Tuple[str, ...], List[Any]]] = {name: {} for name in HISTOGRAMS}
+        gauges: Dict[str, float] = {name: 0 for name in GAUGES}
+        counters: Dict[str, float] = {name: 0 for name in COUNTERS}
+
+        for snapshot in snapshots:
+            for name, series in snapshot.get("histograms", {}).items():
+                merged = histograms.setdefault(name, {})
+                for labels, counts, total in series:
+                    key = tuple(labels)
+                    if key not in merged:
+                        merged[key] = [list(counts), total]
+                    else:
+                        merged_counts = merged[key][0]
+                        for i, count in enumerate(counts):
+                            merged_counts[i] += count
+                        merged[key][1] += total
+            for name, value in snapshot.get("gauges", {}).items():
+                gauges[name] = gauges.get(name, 0) + value
+            for name, value in snapshot.get("counters", {}).items():
+                counters[name] = counters.get(name, 0) + value
+
+        return {
+            "histograms": {
+                name: [[list(labels), counts, total] for labels, (counts, total) in series.items()]
+                for name, series in histograms.items()
+            },
+            "gauges": gauges,
+            "counters": counters,
+        }
+
+    def _worker_snapshots(self) -> List[Dict[str, Any]]:
+        """Snapshots written by the other live workers"""
+        if not self.metrics_dir or not self.metrics_dir.exists():
+            return []
+
+        own = f"{os.getpid()}.json"
+        stale_before = time.time() - max(60, settings.metrics_flush_interval_seconds * 3)
+        snapshots = []
+        for path in self.metrics_dir.glob("*.json"):
+            try:
+                if path.name == own or path.stat().st_mtime < stale_before:
+                    continue
+                snapshots.append(orjson.loads(path.read_bytes()))
+            except (OSError, ValueError):
+                # Being replaced or removed by its worker
+                continue
+        return snapshots
+
+    async def render(self) -> str:
+        """All workers' metrics in the Prometheus text format"""
+        own = self.snapshot()
+        # The other workers' snapshots are files; read them off the event loop
+        snapshot = self.merge([own, *await asyncio.to_thread(self._worker_snapshots)])
+        bounds = [format(bound, "g") for bound in LATENCY_BUCKETS] + ["+Inf"]
+        lines: List[str] = []
+
+        for name, series in snapshot["histograms"].items():
+            description, label_names = HISTOGRAMS.get(name, (name, ()))
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, counts, total in series:
+                label_text = ",".join(
+                    f'{label}="{_escape(value)}"' for label, value in zip(label_names, labels)
+                )
+                prefix = f"{label_text}," if label_text else ""
+                cumulative = 0
+                for bound, count in zip(bounds, counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                labels_suffix = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"{name}_sum{labels_suffix} {total}")
+                lines.append(f"{name}_count{labels_suffix} {cumulative}")
+
+        for name, value in snapshot["gauges"].items():
+            lines.append(f"# HELP {name} {GAUGES.get(name, name)}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value:g}")
+
+        for name, value in snapshot["counters"].items():
+            lines.append(f"# HELP {name} {COUNTERS.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value:g}")
+
+        return "\n".join(lines) + "\n"
+
+    def _write_snapshot(self) -> None:
+        self.metrics_dir.mkdir(parents=True, exist_ok=True)
+        path = self.metrics_dir / f"{os.getpid()}.json"
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(orjson.dumps(self.snapshot()))
+        os.replace(tmp_path, path)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.metrics_flush_interval_seconds)
+            try:
+                await asyncio.to_thread(self._write_snapshot)
+            except Exception as e:
+                logger.error(f"Failed to write metrics snapshot: {str(e)}")
+
+    def start(self) -> None:
+        """Start sharing this worker's metrics when a metrics directory is configured"""
+        if self.metrics_dir and self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.metrics_dir:
+            (self.metrics_dir / f"{os.getpid()}.json").unlink(missing_ok=True)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+metrics_registry = MetricsRegistry(settings.metrics_dir)
@@ -1,112 +1,204 @@
+import math
 import time
 import uuid
-from typing import Callable, Dict, List, Tuple, Optional, Any
-from fastapi import Request, Response, status
+from typing import Dict, Optional
+from fastapi import status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-import redis.asyncio as redis
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.utils.logging import get_logger
+from app.utils.rate_limit import create_rate_limiter, policy_table, RateLimitPolicy
+from app.utils.load_shedding import load_shedder
+from app.utils.access_log import access_log_sampler
+from app.utils.metrics import metrics_registry
+from app.utils.auth import get_token_subject
 from app.config.settings import get_settings
 
 settings = get_settings()
 logger = get_logger("middleware")
 
-# Simple in-memory rate limiter for development
-# In production, use Redis for distributed rate limiting
-class InMemoryStore:
-    def __init__(self):
-        self.store: Dict[str, List[float]] = {}
-        
-    async def get_requests(self, key: str) -> List[float]:
-        if key not in self.store:
-            self.store[key] = []
-        return self.store[key]
-        
-    async def add_request(self, key: str, timestamp: float):
-        if key not in self.store:
-            self.store[key] = []
-        self.store[key].append(timestamp)
-        
-    async def clean_old_requests(self, key: str, window_ms: int):
-        if key not in self.store:
-            return
-        cutoff = time.time() - (window_ms / 1000)
-        self.store[key] = [t for t in self.store[key] if t > cutoff]
+# In-memory for development; set RATE_LIMIT_BACKEND=redis to share
+# limits across workers and nodes in production
+rate_limiter = create_rate_limiter()
 
-# Memory store for development
-memory_store = InMemoryStore()
+def get_rate_limit_identity(scope: Scope, policy: RateLimitPolicy) -> str:
+    """Authenticated user ID when the policy allows it, otherwise the client IP"""
+    if policy.per_user:
+        authorization = Headers(scope=scope).get("authorization", "")
+        if authorization[:7].lower() == "bearer ":
+            user_id = get_token_subject(authorization[7:])
+            if user_id:
+                return f"user:{user_id}"
+    
+    client = scope.get("client")
+    client_ip = client[0] if client else "unknown"
+    return f"ip:{client_ip}"
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+class RateLimitMiddleware:
     """
     Rate limiting middleware to prevent abuse
+    
+    Implemented as plain ASGI so allowed requests pass straight through
+    without the per-request task and stream wrapping of BaseHTTPMiddleware.
     """
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        if not settings.rate_limit_enabled:
-            return await call_next(request)
-            
-        # Get client IP or use forwarded header in production
-        client_ip = request.client.host if request.client else "unknown"
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.rate_limit_enabled:
+            await self.app(scope, receive, send)
+            return
         
-        # Skip rate limiting for certain paths
-        if request.url.path.startswith("/api/docs") or request.url.path.startswith("/api/redoc"):
-            return await call_next(request)
+        # Find the policy for this route
+        policy = policy_table.match(scope["method"], scope["path"])
+        if policy is None or policy.exempt:
+            await self.app(scope, receive, send)
+            return
         
-        # Get request timestamp
-        current_time = time.time()
+        identity = get_rate_limit_identity(scope, policy)
         
-        # Check rate limit
-        await memory_store.clean_old_requests(client_ip, settings.rate_limit_window_ms)
-        recent_requests = await memory_store.get_requests(client_ip)
+        # Check and count the request in one step
+        result = await rate_limiter.hit(
+            f"{policy.name}:{identity}",
+            policy.limit,
+            policy.window_seconds,
+            policy.cost
+        )
         
-        if len(recent_requests) >= settings.rate_limit_max_requests:
-            logger.warning(f"Rate limit exceeded for IP: {client_ip}")
-            return JSONResponse(
+        if not result.allowed:
+            logger.warning(f"Rate limit '{policy.name}' exceeded for {identity}")
+            response = JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 content={
                     "success": False,
                     "message": "Too many requests, please try again later",
                     "error": "rate_limit_exceeded"
-                }
+                },
+                headers={"Retry-After": str(math.ceil(result.retry_after))}
             )
-        
-        # Add current request to store
-        await memory_store.add_request(client_ip, current_time)
+            await response(scope, receive, send)
+            return
         
         # Process request
-        return await call_next(request)
+        await self.app(scope, receive, send)
 
-class ErrorHandlerMiddleware(BaseHTTPMiddleware):
+class MetricsMiddleware:
+    """
+    Records request latency per method, route template and status
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.metrics_enabled:
+            await self.app(scope, receive, send)
+            return
+        
+        start_time = time.perf_counter()
+        response_status: Dict[str, Optional[int]] = {"code": None}
+        
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response_status["code"] = message["status"]
+            await send(message)
+        
+        metrics_registry.inc("http_requests_in_flight")
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics_registry.inc("http_requests_in_flight", -1)
+            # The route template is set once routing matched; raw paths
+            # would give every ID its own series
+            route = scope.get("route")
+            metrics_registry.observe(
+                "http_request_duration_seconds",
+                (scope["method"], getattr(route, "path", "unmatched"), str(response_status["code"] or 500)),
+                time.perf_counter() - start_time
+            )
+
+class LoadSheddingMiddleware:
+    """
+    Sheds requests over the adaptive concurrency limit with 503 + Retry-After
+
+    The limit shrinks on responses slower than the route class target and
+    on 503/504 responses, which is how DatabaseUnavailable and other
+    upstream timeouts are served. ErrorHandlerMiddleware runs inside this
+    middleware and turns other exceptions into 500s first; those are not
+    counted, so one failing endpoint cannot drag down the shared limit.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.load_shedding_enabled:
+            await self.app(scope, receive, send)
+            return
+        
+        route_class = load_shedder.match(scope["method"], scope["path"])
+        if route_class is None or route_class.exempt:
+            await self.app(scope, receive, send)
+            return
+        
+        if not load_shedder.try_acquire(route_class):
+            response = JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={
+                    "success": False,
+                    "message": "Server is busy, please try again shortly",
+                    "error": "overloaded"
+                },
+                headers={"Retry-After": str(settings.load_shed_retry_after_seconds)}
+            )
+            await response(scope, receive, send)
+            return
+        
+        started = time.monotonic()
+        response_status: Dict[str, Optional[int]] = {"code": None}
+        
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response_status["code"] = message["status"]
+            await send(message)
+        
+        # Only an exception raised after the response started gets past
+        # ErrorHandlerMiddleware; the connection is dropped then, which
+        # counts as overload like a 503/504
+        overloaded = True
+        try:
+            await self.app(scope, receive, send_wrapper)
+            overloaded = response_status["code"] in (503, 504)
+        finally:
+            load_shedder.release(route_class, started, overloaded)
+
+class ErrorHandlerMiddleware:
     """
     Global error handling middleware
     """
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
         request_id = str(uuid.uuid4())
-        request.state.request_id = request_id
+        # Same storage as request.state.request_id
+        scope.setdefault("state", {})["request_id"] = request_id
         
         start_time = time.time()
-        path = request.url.path
-        method = request.method
+        path = scope["path"]
+        method = scope["method"]
+        response_status: Dict[str, Optional[int]] = {"code": None}
+        
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response_status["code"] = message["status"]
+            await send(message)
         
         try:
-            response = await call_next(request)
-            
-            # Log request details
-            process_time = (time.time() - start_time) * 1000
-            log = logger.info if response.status_code < 400 else logger.warning
-            
-            log(
-                f"{method} {path} completed",
-                extra={
-                    "request_id": request_id,
-                    "method": method,
-                    "path": path,
-                    "status_code": response.status_code,
-                    "duration_ms": process_time
-                }
-            )
-            
-            return response
+            await self.app(scope, receive, send_wrapper)
             
         except Exception as e:
             # Log the exception
@@ -122,8 +214,12 @@ class ErrorHandlerMiddleware(BaseHTTPMiddleware):
                 }
             )
             
+            # Headers already went out; the connection can only be dropped
+            if response_status["code"] is not None:
+                raise
+            
             # Return JSON error response
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 content={
                     "success": False,
@@ -131,4 +227,27 @@ class ErrorHandlerMiddleware(BaseHTTPMiddleware):
                     "error": "server_error",
                     "request_id": request_id
                 }
-            ) 
\ No newline at end of file
+            )
+            await response(scope, receive, send)
+            return
+        
+        # Log request details
+        process_time = (time.time() - start_time) * 1000
+        status_code = response_status["code"] or 0
+        
+        # Errors and slow requests are always logged, the rest sampled
+        if not access_log_sampler.should_log(scope, request_id, status_code, process_time):
+            return
+        
+        log = logger.info if status_code < 400 else logger.warning
+        
+        log(
+            f"{method} {path} completed",
+            extra={
+                "request_id": request_id,
+                "method": method,
+                "path": path,
+                "status_code": status_code,
+                "duration_ms": process_time
+            }
+        )
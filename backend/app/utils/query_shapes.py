@@ -0,0 +1,87 @@
+import hashlib
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+# Placeholder for literal values in a query shape
+PLACEHOLDER = "?"
+
+def extract_query(entry: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any], Dict[str, Any]]]:
+    """
+    Collection, filter and sort of a profiler entry
+
+    Handles find, count, distinct, aggregate (leading $match and $sort),
+    update and delete; returns None for anything else.
+    """
+    namespace = entry.get("ns", "")
+    collection = namespace.split(".", 1)[1] if "." in namespace else namespace
+    command = entry.get("command") or {}
+    op = entry.get("op")
+
+    if "find" in command:
+        return collection, command.get("filter") or {}, command.get("sort") or {}
+    if "count" in command or "distinct" in command:
+        return collection, command.get("query") or {}, {}
+    if "aggregate" in command:
+        query: Dict[str, Any] = {}
+        sort: Dict[str, Any] = {}
+        for stage in command.get("pipeline") or []:
+            if "$match" in stage and not sort:
+                query.update(stage["$match"])
+            elif "$sort" in stage and not sort:
+                sort = stage["$sort"]
+            else:
+                break
+        return collection, query, sort
+    if op in ("update", "remove") and "q" in command:
+        return collection, command.get("q") or {}, {}
+    # Older profiler format
+    if op == "query" and "query" in entry:
+        return collection, entry["query"].get("filter", entry["query"]), entry["query"].get("sort", {})
+    return None
+
+def normalize_query(value: Any) -> Any:
+    """
+    Replace the literal values of a filter with placeholders
+
+    Field names and operators are kept, so queries that differ only in
+    their values share a shape. Lists (such as $in operands) collapse to a
+    single placeholder whatever their length; lists of sub-filters ($or,
+    $and) keep their structure.
+    """
+    if isinstance(value, dict):
+        return {key: normalize_query(item) for key, item in value.items()}
+    if isinstance(value, list):
+        if value and all(isinstance(item, dict) for item in value):
+            return [normalize_query(item) for item in value]
+        return PLACEHOLDER
+    return PLACEHOLDER
+
+def operation_name(entry: Dict[str, Any]) -> str:
+    command = entry.get("command") or {}
+    if entry.get("op") == "command" and command:
+        return next(iter(command))
+    return entry.get("op", "unknown")
+
+def query_shape(entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Normalized shape of a profiler entry, with a stable ID"""
+    extracted = extract_query(entry)
+    if extracted is None:
+        return None
+    collection, query, sort = extracted
+    shape = {
+        "collection": collection,
+        "operation": operation_name(entry),
+        "filter": normalize_query(query),
+        "sort": dict(sort),
+    }
+    shape_id = hashlib.sha1(orjson.dumps(shape, option=orjson.OPT_SORT_KEYS)).hexdigest()[:16]
+    return {"id": shape_id, **shape}
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0
+    rank = max(math.ceil(q * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
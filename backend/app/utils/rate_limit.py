@@ -0,0 +1,280 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Generic, List, NamedTuple, Optional, Tuple, TypeVar, Union
+
+import redis.asyncio as redis
+
+from app.config.settings import get_settings
+from app.utils.logging import get_logger
+
+settings = get_settings()
+logger = get_logger("rate_limit")
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    remaining: int
+    retry_after: float
+
+class _Window:
+    """Fixed-size counter state for one key"""
+    __slots__ = ("window", "current", "previous", "last_seen")
+
+    def __init__(self, window: int, now: float):
+        self.window = window
+        self.current = 0.0
+        self.previous = 0.0
+        self.last_seen = now
+
+class InMemoryRateLimiter:
+    """
+    Sliding-window-counter rate limiter for a single process
+
+    Each key keeps the request count of the current and previous fixed
+    window; the sliding count is the current count plus the previous one
+    weighted by how much of it still overlaps the sliding window. Checks are
+    O(1) and the state per key is constant. Keys are held in LRU order: idle
+    keys (no requests for two windows, so their counts are zero) are evicted
+    from the front as new requests come in, and `max_keys` caps memory.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self.entries: "OrderedDict[str, _Window]" = OrderedDict()
+
+    def _evict(self, now: float, idle_after: float) -> None:
+        entries = self.entries
+        while entries:
+            oldest = next(iter(entries.values()))
+            if len(entries) <= self.max_keys and now - oldest.last_seen < idle_after:
+                break
+            entries.popitem(last=False)
+
+    def check(self, key: str, limit: int, window_seconds: float, cost: float = 1,
+              now: Optional[float] = None) -> RateLimitResult:
+        """Count a request of `cost` against `limit` per `window_seconds` for `key`"""
+        now = time.time() if now is None else now
+        window = int(now // window_seconds)
+
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = _Window(window, now)
+            self.entries[key] = entry
+        else:
+            self.entries.move_to_end(key)
+            if window != entry.window:
+                entry.previous = entry.current if window == entry.window + 1 else 0.0
+                entry.current = 0.0
+                entry.window = window
+        entry.last_seen = now
+
+        self._evict(now, 2 * window_seconds)
+
+        elapsed = (now % window_seconds) / window_seconds
+        count = entry.previous * (1 - elapsed) + entry.current
+
+        if count + cost > limit:
+            # Time until enough of the previous window slides out, or the next window starts
+            if entry.previous > 0 and entry.current + cost <= limit:
+                needed = (count + cost - limit) / entry.previous
+                retry_after = needed * window_seconds
+            else:
+                retry_after = (1 - elapsed) * window_seconds
+            return RateLimitResult(False, 0, retry_after)
+
+        entry.current += cost
+        return RateLimitResult(True, int(limit - count - cost), 0.0)
+
+    async def hit(self, key: str, limit: int, window_seconds: float, cost: float = 1) -> RateLimitResult:
+        return self.check(key, limit, window_seconds, cost)
+
+    async def close(self) -> None:
+        self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+# Sliding window counter check-and-increment, evaluated atomically in Redis.
+# KEYS: current window counter, previous window counter
+# ARGV: limit, cost, weight of the previous window, counter TTL in seconds
+SLIDING_WINDOW_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local limit = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+if previous * tonumber(ARGV[3]) + current + cost > limit then
+    return {0, current, previous}
+end
+current = redis.call('INCRBY', KEYS[1], cost)
+if current == cost then
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+end
+return {1, current, previous}
+"""
+
+class RedisRateLimiter:
+    """
+    Sliding-window-counter rate limiter shared by every worker and node
+
+    Each check is one EVALSHA round trip on a pooled connection. With
+    `local_batch` > 1 a process reserves that many tokens per round trip
+    and spends them locally, trading up to `local_batch` tokens of
+    over-reservation per process for fewer Redis calls. Redis errors fail
+    open: the request is allowed and the failure logged.
+    """
+
+    def __init__(self, url: str, pool_size: int = 50, local_batch: int = 0,
+                 max_keys: int = 100000, prefix: str = "rl"):
+        # Short socket timeouts so an unhealthy Redis fails open quickly
+        self.pool = redis.ConnectionPool.from_url(
+            url,
+            max_connections=pool_size,
+            socket_timeout=0.25,
+            socket_connect_timeout=0.25
+        )
+        self.client = redis.Redis(connection_pool=self.pool)
+        self.script = self.client.register_script(SLIDING_WINDOW_SCRIPT)
+        self.local_batch = local_batch
+        self.max_keys = max_keys
+        self.prefix = prefix
+        # Locally held tokens per key: (window id, tokens left)
+        self.leases: "OrderedDict[str, list]" = OrderedDict()
+        self._last_error_log = 0.0
+
+    async def _eval(self, key: str, window: int, limit: int, window_seconds: float,
+                    cost: int, weight: float):
+        return await self.script(
+            keys=[f"{self.prefix}:{key}:{window}", f"{self.prefix}:{key}:{window - 1}"],
+            args=[limit, cost, weight, int(window_seconds * 2) + 1]
+        )
+
+    def _result(self, allowed: bool, limit: int, cost: float, current: float, previous: float,
+                elapsed: float, window_seconds: float) -> RateLimitResult:
+        count = previous * (1 - elapsed) + current
+        if allowed:
+            return RateLimitResult(True, max(int(limit - count), 0), 0.0)
+        if previous > 0 and current + cost <= limit:
+            retry_after = (count + cost - limit) / previous * window_seconds
+        else:
+            retry_after = (1 - elapsed) * window_seconds
+        return RateLimitResult(False, 0, retry_after)
+
+    async def hit(self, key: str, limit: int, window_seconds: float, cost: float = 1) -> RateLimitResult:
+        now = time.time()
+        window = int(now // window_seconds)
+        elapsed = (now % window_seconds) / window_seconds
+        cost = int(cost)
+
+        lease = self.leases.get(key)
+        if lease and lease[0] == window and lease[1] >= cost:
+            lease[1] -= cost
+            self.leases.move_to_end(key)
+            return RateLimitResult(True, lease[1], 0.0)
+
+        try:
+            reserve = max(self.local_batch, cost)
+            allowed, current, previous = await self._eval(key, window, limit, window_seconds, reserve, 1 - elapsed)
+            if not allowed and reserve > cost:
+                # Not enough room for a whole batch; fall back to the exact cost
+                reserve = cost
+                allowed, current, previous = await self._eval(key, window, limit, window_seconds, cost, 1 - elapsed)
+        except (redis.RedisError, OSError) as e:
+            if now - self._last_error_log > 60:
+                logger.error(f"Redis rate limiting unavailable, allowing requests: {str(e)}")
+                self._last_error_log = now
+            return RateLimitResult(True, limit, 0.0)
+
+        if allowed and reserve > cost:
+            self.leases[key] = [window, reserve - cost]
+            self.leases.move_to_end(key)
+            if len(self.leases) > self.max_keys:
+                self.leases.popitem(last=False)
+
+        return self._result(bool(allowed), limit, cost, current, previous, elapsed, window_seconds)
+
+    async def close(self) -> None:
+        await self.pool.disconnect()
+
+RateLimiter = Union[InMemoryRateLimiter, RedisRateLimiter]
+
+def create_rate_limiter() -> RateLimiter:
+    """Create the rate limiter selected by the RATE_LIMIT_BACKEND setting"""
+    if settings.rate_limit_backend == "redis":
+        return RedisRateLimiter(
+            settings.redis_url,
+            pool_size=settings.rate_limit_redis_pool_size,
+            local_batch=settings.rate_limit_local_batch,
+            max_keys=settings.rate_limit_max_keys
+        )
+    return InMemoryRateLimiter(max_keys=settings.rate_limit_max_keys)
+
+class RateLimitPolicy(NamedTuple):
+    """Limit applied to the requests matched by a route pattern"""
+    name: str
+    limit: int
+    window_seconds: float
+    cost: float = 1
+    per_user: bool = True  # Key by authenticated user instead of client IP
+    exempt: bool = False
+
+# (method, path prefix, policy); "*" matches any method and the longest
+# matching prefix wins. Each policy name is a separate budget.
+DEFAULT_WINDOW = settings.rate_limit_window_ms / 1000
+RATE_LIMIT_POLICIES: List[Tuple[str, str, RateLimitPolicy]] = [
+    ("*", "/", RateLimitPolicy("default", settings.rate_limit_max_requests, DEFAULT_WINDOW)),
+    ("*", "/health", RateLimitPolicy("health", settings.rate_limit_max_requests * 10, DEFAULT_WINDOW, per_user=False)),
+    ("*", "/metrics", RateLimitPolicy("health", settings.rate_limit_max_requests * 10, DEFAULT_WINDOW, per_user=False)),
+    ("*", "/api/docs", RateLimitPolicy("docs", 0, DEFAULT_WINDOW, exempt=True)),
+    ("*", "/api/redoc", RateLimitPolicy("docs", 0, DEFAULT_WINDOW, exempt=True)),
+    ("*", "/api/openapi.json", RateLimitPolicy("docs", 0, DEFAULT_WINDOW, exempt=True)),
+    # Password hashing makes these the most expensive endpoints. Logins keep
+    # their own budget, as large as the shared one they had before, so
+    # registrations from an address cannot lock its users out.
+    ("POST", "/api/auth/login", RateLimitPolicy("login", settings.rate_limit_max_requests, DEFAULT_WINDOW, per_user=False)),
+    ("POST", "/api/auth/register", RateLimitPolicy("register", 20, DEFAULT_WINDOW, cost=4, per_user=False)),
+    ("*", "/api/admin", RateLimitPolicy("admin", settings.rate_limit_max_requests, DEFAULT_WINDOW, cost=5)),
+    # Providers deliver bursts from a few addresses; intake itself is cheap
+    ("POST", "/api/webhooks", RateLimitPolicy("webhooks", settings.rate_limit_max_requests * 50, DEFAULT_WINDOW, per_user=False)),
+]
+
+T = TypeVar("T")
+
+class PolicyTable(Generic[T]):
+    """
+    Route policies compiled into a path-segment trie
+
+    A lookup walks at most one node per path segment, remembering the
+    deepest policy seen for the request method, instead of testing every
+    pattern with startswith. Policies may be any value, including falsy
+    ones such as a sample rate of 0.
+    """
+
+    def __init__(self, policies: List[Tuple[str, str, T]]):
+        self.root: Dict[str, Any] = {"children": {}, "policies": {}}
+        for method, prefix, policy in policies:
+            node = self.root
+            for segment in self._segments(prefix):
+                node = node["children"].setdefault(segment, {"children": {}, "policies": {}})
+            node["policies"][method.upper()] = policy
+
+    @staticmethod
+    def _segments(path: str) -> List[str]:
+        return [segment for segment in path.split("/") if segment]
+
+    def match(self, method: str, path: str) -> Optional[T]:
+        node = self.root
+        found = self._lookup(node["policies"], method, None)
+        for segment in self._segments(path):
+            node = node["children"].get(segment)
+            if node is None:
+                break
+            found = self._lookup(node["policies"], method, found)
+        return found
+
+    @staticmethod
+    def _lookup(policies: Dict[str, T], method: str, default: Optional[T]) -> Optional[T]:
+        # Test for presence rather than truthiness so falsy policies still match
+        if method in policies:
+            return policies[method]
+        return policies.get("*", default)
+
+policy_table: PolicyTable[RateLimitPolicy] = PolicyTable(RATE_LIMIT_POLICIES)
@@ -0,0 +1,217 @@
+import asyncio
+import bisect
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.config import database
+from app.config.settings import get_settings
+from app.utils.chain_events import register_projection, normalize_address
+from app.utils.logging import get_logger
+
+settings = get_settings()
+logger = get_logger("blockchain.reputation")
+
+SCORES = range(1, 6)
+
+class LeaderboardSnapshot:
+    """
+    In-process copy of the top of the mentor_reputation leaderboard
+
+    Entries are kept sorted by (average_rating, rating_count) descending and
+    patched in place as projection updates come in, so hot leaderboard reads
+    never hit the database. Only the worker running the projections sees
+    those updates, so every worker also reloads the snapshot once it is
+    older than `leaderboard_snapshot_ttl_seconds`.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.entries: List[Dict[str, Any]] = []
+        self.loaded = False
+        self._loaded_monotonic = 0.0
+        self._load: Optional[asyncio.Future] = None
+
+    @staticmethod
+    def _sort_key(entry: Dict[str, Any]):
+        return (-entry["average_rating"], -entry["rating_count"], entry["_id"])
+
+    async def load(self) -> None:
+        """Fill the snapshot from the sorted score index"""
+        self.entries = await database.db.mentor_reputation.find(
+            {"rating_count": {"$gt": 0}},
+            sort=[("average_rating", -1), ("rating_count", -1), ("_id", 1)],
+            limit=self.size
+        ).to_list(length=self.size)
+        self.loaded = True
+        self._loaded_monotonic = time.monotonic()
+
+    async def reload(self) -> None:
+        """Reload the snapshot, joining a load already in progress"""
+        if self._load is None or self._load.done():
+            self._load = asyncio.ensure_future(self.load())
+        await asyncio.shield(self._load)
+
+    def _expired(self) -> bool:
+        return time.monotonic() - self._loaded_monotonic > settings.leaderboard_snapshot_ttl_seconds
+
+    def apply(self, doc: Dict[str, Any]) -> None:
+        """Merge an updated mentor_reputation document into the snapshot"""
+        if not self.loaded:
+            return
+
+        was_full = len(self.entries) >= self.size
+        self.entries = [e for e in self.entries if e["_id"] != doc["_id"]]
+
+        if doc.get("rating_count", 0) > 0:
+            keys = [self._sort_key(e) for e in self.entries]
+            position = bisect.bisect_left(keys, self._sort_key(doc))
+            if position < self.size and (position < len(self.entries) or not was_full):
+                self.entries.insert(position, doc)
+
+        if len(self.entries) > self.size:
+            del self.entries[self.size:]
+        elif was_full and len(self.entries) < self.size:
+            # A mentor dropped out of the top; the next one is only in the database
+            self.loaded = False
+
+    async def top(self, limit: int) -> List[Dict[str, Any]]:
+        if not self.loaded or self._expired():
+            await self.reload()
+        return self.entries[:limit]
+
+snapshot = LeaderboardSnapshot(settings.leaderboard_snapshot_size)
+
+async def _update_reputation(mentor: str) -> None:
+    """
+    Recompute a mentor's aggregate from their projected ratings
+
+    The aggregate is derived rather than adjusted, so it converges however
+    often it runs, including after a failure between the rating write and
+    this update.
+    """
+    rows = await database.db.mentor_ratings.aggregate([
+        {"$match": {"mentor": mentor}},
+        {"$group": {"_id": "$score", "count": {"$sum": 1}}},
+    ]).to_list(length=None)
+
+    histogram = {str(score): 0 for score in SCORES}
+    for row in rows:
+        histogram[str(row["_id"])] = row["count"]
+    rating_count = sum(row["count"] for row in rows)
+    total_score = sum(row["_id"] * row["count"] for row in rows)
+
+    doc = await database.db.mentor_reputation.find_one_and_update(
+        {"_id": mentor},
+        {"$set": {
+            "total_score": total_score,
+            "rating_count": rating_count,
+            "histogram": histogram,
+            # Same scale as ReputationSystem.getMentorAverageRating (450 == 4.5 stars)
+            "average_rating": total_score * 100 // rating_count if rating_count else 0,
+            "updated_at": datetime.utcnow(),
+        }},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    snapshot.apply(doc)
+
+async def _apply_rating_submitted(event: Dict[str, Any]) -> str:
+    args = event["args"]
+    mentor = normalize_address(args["mentor"])
+    session_id = int(args["sessionId"])
+    score = int(args["score"])
+
+    try:
+        await database.db.mentor_ratings.insert_one({
+            "_id": f"{mentor}:{session_id}",
+            "mentor": mentor,
+            "mentee": normalize_address(args["mentee"]),
+            "session_id": session_id,
+            "score": score,
+            "block_number": event["block_number"],
+            "log_index": event["log_index"],
+            "tx_hash": event["tx_hash"],
+        })
+    except DuplicateKeyError:
+        # Submission already projected (redelivered event)
+        pass
+
+    return mentor
+
+async def _apply_rating_updated(event: Dict[str, Any]) -> str:
+    args = event["args"]
+    mentor = normalize_address(args["mentor"])
+    session_id = int(args["sessionId"])
+    score = int(args["score"])
+    block_number, log_index = event["block_number"], event["log_index"]
+
+    # Swap in the new score only if this event is newer than the stored one,
+    # which makes redelivered or out-of-order updates no-ops
+    await database.db.mentor_ratings.update_one(
+        {
+            "_id": f"{mentor}:{session_id}",
+            "$or": [
+                {"block_number": {"$lt": block_number}},
+                {"block_number": block_number, "log_index": {"$lt": log_index}},
+            ]
+        },
+        {"$set": {
+            "score": score,
+            "block_number": block_number,
+            "log_index": log_index,
+            "tx_hash": event["tx_hash"],
+        }}
+    )
+    return mentor
+
+@register_projection("ReputationSystem", "RatingSubmitted", "RatingUpdated")
+async def project_ratings(events: List[Dict[str, Any]]) -> None:
+    """Apply RatingSubmitted/RatingUpdated events to the mentor_reputation collection"""
+    mentors: Dict[str, None] = {}
+    for event in events:
+        if event["event"] == "RatingSubmitted":
+            mentor = await _apply_rating_submitted(event)
+        else:
+            mentor = await _apply_rating_updated(event)
+        mentors[mentor] = None
+
+    # Recompute every mentor the batch touched, including replayed events,
+    # so an aggregate left stale by an earlier failure is repaired
+    for mentor in mentors:
+        await _update_reputation(mentor)
+
+def _format_reputation(doc: Dict[str, Any]) -> Dict[str, Any]:
+    histogram = doc.get("histogram", {})
+    return {
+        "mentor": doc["_id"],
+        "average_rating": doc.get("average_rating", 0),
+        "rating_count": doc.get("rating_count", 0),
+        "total_score": doc.get("total_score", 0),
+        "histogram": {str(score): histogram.get(str(score), 0) for score in SCORES},
+        "updated_at": doc.get("updated_at"),
+    }
+
+async def get_leaderboard(limit: int) -> List[Dict[str, Any]]:
+    """
+    Top mentors by average rating
+    Served from the in-process snapshot when it covers the requested size
+    """
+    if limit <= snapshot.size:
+        docs = await snapshot.top(limit)
+    else:
+        docs = await database.db.mentor_reputation.find(
+            {"rating_count": {"$gt": 0}},
+            sort=[("average_rating", -1), ("rating_count", -1), ("_id", 1)],
+            limit=limit
+        ).to_list(length=limit)
+
+    return [_format_reputation(doc) for doc in docs]
+
+async def get_mentor_reputation(mentor: str) -> Optional[Dict[str, Any]]:
+    """Projected reputation of a single mentor"""
+    doc = await database.db.mentor_reputation.find_one({"_id": normalize_address(mentor)})
+    return _format_reputation(doc) if doc else None
@@ -66,6 +66,14 @@ async def scheduled_health_check() -> Dict[str, Any]:
     logger.info(f"Health check results: Database connection: {db_connection}")
     return results
 
+async def scheduled_slow_query_snapshot() -> None:
+    """Save a snapshot of slow query shapes for trending"""
+    from app.utils.db_indexes import analyze_slow_queries
+    from app.utils.db_guard import db_guard
+    
+    analysis = await db_guard.run("background", lambda: analyze_slow_queries(save_snapshot=True))
+    logger.info(f"Saved slow query snapshot with {len(analysis['shapes'])} shapes")
+
 def setup_scheduler():
     """Set up scheduled tasks"""
     scheduler = get_scheduler()
@@ -87,9 +95,18 @@ def setup_scheduler():
         replace_existing=True
     )
     
+    # Add slow query snapshot job (hourly)
+    scheduler.add_job(
+        scheduled_slow_query_snapshot,
+        "interval",
+        hours=1,
+        id="slow_query_snapshot",
+        replace_existing=True
+    )
+    
     # Start the scheduler
     scheduler.start()
-    logger.info("Scheduler started with jobs: database_backup, health_check")
+    logger.info("Scheduler started with jobs: database_backup, health_check, slow_query_snapshot")
     
 def shutdown_scheduler():
     """Shutdown the scheduler"""
@@ -1,12 +1,99 @@
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
 import sentry_sdk
 from sentry_sdk.integrations.fastapi import FastApiIntegration
 from sentry_sdk.integrations.starlette import StarletteIntegration
 from sentry_sdk.integrations.asyncio import AsyncioIntegration
 
 from app.config.settings import get_settings
+from app.utils.rate_limit import PolicyTable
 
 settings = get_settings()
 
+# (method, path prefix, share of ordinary traces sent); "*" matches any
+# method and the longest matching prefix wins. Routes with a rate of 0 are
+# not traced at all; slow and failed requests on the others are always sent.
+TRACE_SAMPLE_RATES: List[Tuple[str, str, float]] = [
+    ("*", "/", settings.sentry_traces_sample_rate),
+    ("*", "/health", 0.0),
+    ("*", "/metrics", 0.0),
+]
+
+SERVER_ERROR_STATUSES = {"internal_error", "unknown_error", "unavailable", "deadline_exceeded", "data_loss"}
+
+def _timestamp(value: Union[str, float, datetime, None]) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.rstrip("Z")).timestamp()
+    return float(value)
+
+class TraceSampler:
+    """
+    Sampling policy for Sentry performance traces
+
+    The head decision (`traces_sampler`) records transactions only while the
+    per-process budget of `sentry_traces_max_per_second` has tokens left, so
+    span overhead is bounded however busy the process is. The tail decision
+    (`before_send_transaction`) always sends recorded transactions that
+    failed or were slower than `sentry_traces_slow_ms`, and sends the rest at
+    their route's rate, decided by trace ID.
+    """
+
+    def __init__(self, sample_rates: List[Tuple[str, str, float]]):
+        self.rates: PolicyTable[float] = PolicyTable(sample_rates)
+        self.max_per_second = settings.sentry_traces_max_per_second
+        self.slow_seconds = settings.sentry_traces_slow_ms / 1000
+        self.tokens = float(self.max_per_second)
+        self._refilled = time.monotonic()
+
+    def _rate(self, method: str, path: str) -> float:
+        rate = self.rates.match(method, path)
+        return settings.sentry_traces_sample_rate if rate is None else rate
+
+    def _take_token(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.max_per_second, self.tokens + (now - self._refilled) * self.max_per_second)
+        self._refilled = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def traces_sampler(self, sampling_context: Dict[str, Any]) -> float:
+        if sampling_context.get("parent_sampled") is False:
+            return 0.0
+
+        scope = sampling_context.get("asgi_scope")
+        if scope and scope.get("type") == "http":
+            if self._rate(scope.get("method", "GET"), scope.get("path", "/")) <= 0:
+                return 0.0
+
+        return 1.0 if self._take_token() else 0.0
+
+    def before_send_transaction(self, event: Dict[str, Any], hint: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        trace = event.get("contexts", {}).get("trace", {})
+        status_code = event.get("tags", {}).get("http.status_code")
+        if trace.get("status") in SERVER_ERROR_STATUSES or (status_code and int(status_code) >= 500):
+            return event
+
+        start, end = _timestamp(event.get("start_timestamp")), _timestamp(event.get("timestamp"))
+        if start is not None and end is not None and end - start >= self.slow_seconds:
+            return event
+
+        method = event.get("request", {}).get("method", "GET")
+        rate = self._rate(method, event.get("transaction") or "/")
+        trace_id = trace.get("trace_id")
+        if rate >= 1 or (trace_id and int(trace_id[:8], 16) < rate * 0x100000000):
+            return event
+        return None
+
+trace_sampler = TraceSampler(TRACE_SAMPLE_RATES)
+
 def init_sentry():
     """
     Initialize Sentry for error tracking
@@ -17,7 +104,8 @@ def init_sentry():
         
     sentry_sdk.init(
         dsn=settings.sentry_dsn,
-        traces_sample_rate=settings.sentry_traces_sample_rate,
+        traces_sampler=trace_sampler.traces_sampler,
+        before_send_transaction=trace_sampler.before_send_transaction,
         environment=settings.environment,
         integrations=[
             FastApiIntegration(),
@@ -27,10 +115,7 @@ def init_sentry():
         release="skillswap@1.0.0",  # Use your own versioning scheme
         
         # Configure which data is captured with events
-        send_default_pii=False,  # Avoid sending PII by default
-        
-        # Configure performance monitoring
-        enable_tracing=True
+        send_default_pii=False  # Avoid sending PII by default
     )
     
     # Set user-readable event contexts
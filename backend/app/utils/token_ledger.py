@@ -0,0 +1,165 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson.decimal128 import Decimal128
+from pymongo import UpdateOne
+
+from app.config import database
+from app.utils.chain_events import register_projection, normalize_address
+from app.utils.logging import get_logger
+
+logger = get_logger("blockchain.tokens")
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+# Log positions are packed into one sortable integer per event
+POSITION_MULTIPLIER = 1_000_000
+
+def event_position(block_number: int, log_index: int) -> int:
+    return block_number * POSITION_MULTIPLIER + log_index
+
+def _ledger_entry(event: Dict[str, Any]) -> Dict[str, Any]:
+    args = event["args"]
+    if event["event"] == "Transfer":
+        sender, recipient, kind = args["from"], args["to"], "transfer"
+        amount = int(args["value"])
+    else:
+        sender, recipient, kind = args["mentee"], args["mentor"], "session_payment"
+        amount = int(args["amount"])
+
+    sender, recipient = normalize_address(sender), normalize_address(recipient)
+    return {
+        "_id": f"{event['tx_hash']}:{event['log_index']}",
+        "tx_hash": event["tx_hash"],
+        "log_index": event["log_index"],
+        "block_number": event["block_number"],
+        "kind": kind,
+        "from": sender,
+        "to": recipient,
+        "parties": [p for p in {sender, recipient} if p != ZERO_ADDRESS],
+        # Exact amount; Decimal128 keeps 34 significant digits, enough for
+        # 10^16 tokens of 18 decimals, and the driver raises rather than
+        # rounds anything larger
+        "amount": str(amount),
+        "amount_decimal": Decimal128(str(amount)),
+        "created_at": datetime.utcnow(),
+    }
+
+async def _apply_balances(transfers: List[Dict[str, Any]], session) -> None:
+    """
+    Fold newly recorded transfers into per-address balances
+
+    Only transfers whose ledger entry was inserted in the caller's
+    transaction are passed in, so each transfer is counted once however
+    often or late it is delivered, and the $inc needs no read of the
+    current balance.
+    """
+    deltas: Dict[str, int] = {}
+    for event in transfers:
+        value = int(event["args"]["value"])
+        for address, sign in ((event["args"]["from"], -1), (event["args"]["to"], 1)):
+            address = normalize_address(address)
+            if address != ZERO_ADDRESS:
+                deltas[address] = deltas.get(address, 0) + sign * value
+
+    if not deltas:
+        return
+
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {"_id": address},
+            {"$inc": {"balance": Decimal128(str(delta))}, "$set": {"updated_at": now}},
+            upsert=True
+        )
+        for address, delta in deltas.items()
+    ]
+    await database.db.token_balances.bulk_write(operations, ordered=False, session=session)
+
+@register_projection("MentorshipToken", "Transfer", "SessionPayment")
+async def project_token_events(events: List[Dict[str, Any]]) -> None:
+    """Apply Transfer/SessionPayment events to the ledger and balance projections"""
+    # Ledger entries are keyed by (tx_hash, log_index); $setOnInsert makes replays no-ops
+    operations = [
+        UpdateOne({"_id": entry["_id"]}, {"$setOnInsert": entry}, upsert=True)
+        for entry in map(_ledger_entry, events)
+    ]
+
+    async def record(session) -> int:
+        result = await database.db.token_ledger.bulk_write(operations, ordered=False, session=session)
+        # Only events this call recorded move balances; another delivery or
+        # worker that inserted the rest has applied them already
+        transfers = [events[i] for i in sorted(result.upserted_ids) if events[i]["event"] == "Transfer"]
+        if transfers:
+            await _apply_balances(transfers, session)
+        return result.upserted_count
+
+    # The ledger entries and the balance changes commit together. A failure
+    # in between rolls both back, so the retry inserts the entries again and
+    # moves the balances then.
+    async with await database.client.start_session() as session:
+        upserted = await session.with_transaction(record)
+
+    if upserted < len(operations):
+        logger.info(f"Skipped {len(operations) - upserted} already projected token events")
+
+def _format_balance(doc: Dict[str, Any]) -> Dict[str, Any]:
+    balance = doc.get("balance")
+    return {
+        "address": doc["_id"],
+        "balance": str(balance.to_decimal()) if balance is not None else "0",
+        "updated_at": doc.get("updated_at"),
+    }
+
+async def get_balance(address: str) -> Dict[str, Any]:
+    """Projected token balance of an address"""
+    address = normalize_address(address)
+    doc = await database.db.token_balances.find_one({"_id": address})
+    return _format_balance(doc or {"_id": address})
+
+async def list_balances(limit: int) -> List[Dict[str, Any]]:
+    """Token holders ordered by balance"""
+    docs = await database.db.token_balances.find(
+        {"balance": {"$gt": Decimal128("0")}},
+        sort=[("balance", -1)],
+        limit=limit
+    ).to_list(length=limit)
+    return [_format_balance(doc) for doc in docs]
+
+def _parse_cursor(cursor: str) -> Tuple[int, int]:
+    block_number, log_index = cursor.split(":")
+    return int(block_number), int(log_index)
+
+async def get_statement(
+    address: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    kind: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Ledger entries involving an address, newest first
+    `cursor` is the `next_cursor` returned by the previous page
+    """
+    query: Dict[str, Any] = {"parties": normalize_address(address)}
+    if kind:
+        query["kind"] = kind
+    if cursor:
+        block_number, log_index = _parse_cursor(cursor)
+        query["$or"] = [
+            {"block_number": {"$lt": block_number}},
+            {"block_number": block_number, "log_index": {"$lt": log_index}},
+        ]
+
+    entries = await database.db.token_ledger.find(
+        query,
+        projection={"amount_decimal": 0, "parties": 0},
+        sort=[("block_number", -1), ("log_index", -1)],
+        limit=limit
+    ).to_list(length=limit)
+
+    next_cursor = None
+    if len(entries) == limit:
+        last = entries[-1]
+        next_cursor = f"{last['block_number']}:{last['log_index']}"
+
+    return {"entries": entries, "next_cursor": next_cursor}
@@ -0,0 +1,469 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from eth_account import Account
+from pymongo import ReturnDocument
+from web3 import AsyncWeb3, AsyncHTTPProvider
+from web3.exceptions import TransactionNotFound
+
+from app.config import database
+from app.config.settings import get_settings
+from app.utils.db_guard import db_guard
+from app.utils.leases import LeaderTask, MongoLease
+from app.utils.logging import get_logger
+
+settings = get_settings()
+logger = get_logger("blockchain.transactions")
+
+# Minimal ABI for the calls relayed by the platform wallet
+MENTORSHIP_TOKEN_ABI = [
+    {
+        "name": "processSessionPayment",
+        "type": "function",
+        "stateMutability": "nonpayable",
+        "inputs": [
+            {"name": "mentor", "type": "address"},
+            {"name": "mentee", "type": "address"},
+            {"name": "amount", "type": "uint256"}
+        ],
+        "outputs": [{"name": "", "type": "bool"}]
+    }
+]
+
+# Replacement transactions must outbid the original by at least 10% on most nodes
+GAS_PRICE_BUMP = 1.125
+
+# Gas of a plain value transfer, used by the self-transfers that fill unused nonces
+FILLER_GAS = 21000
+
+class NonceManager:
+    """
+    Hands out nonces for the platform wallet without a round trip per transaction
+
+    A nonce is never handed out twice; one whose transaction cannot be
+    sent is filled by the queue instead (see TransactionQueue._fill_nonce).
+    """
+
+    def __init__(self, w3: AsyncWeb3, address: str):
+        self.w3 = w3
+        self.address = address
+        self.next_nonce: Optional[int] = None
+        self._lock = asyncio.Lock()
+
+    async def sync(self) -> None:
+        """Reload the next nonce from the node, dropping local state"""
+        async with self._lock:
+            self.next_nonce = await self.w3.eth.get_transaction_count(self.address, "pending")
+
+    async def allocate(self) -> int:
+        async with self._lock:
+            if self.next_nonce is None:
+                self.next_nonce = await self.w3.eth.get_transaction_count(self.address, "pending")
+            nonce = self.next_nonce
+            self.next_nonce += 1
+            return nonce
+
+class TransactionQueue:
+    """
+    Asynchronous relay for platform wallet transactions
+
+    Any process persists submissions to the transactions collection. Only
+    the process holding the "tx_relay" lease sends them, so the platform
+    wallet has a single nonce sequence: its pool of workers claims queued
+    transactions atomically and sends each with a locally allocated nonce,
+    so several transactions can be in flight at once. A single poller
+    checks the receipts of every pending transaction per tick and re-sends,
+    with a higher gas price and the same nonce, those stuck past the timeout.
+
+    Nonces are used strictly in order, so one that is never mined blocks
+    every later transaction. A send that fails for good, or a transaction
+    still stuck after `tx_max_retries` replacements, is marked failed and
+    its nonce filled with a zero-value self-transfer at a higher gas price.
+    If the original is mined first after all, it is recorded as such.
+    """
+
+    def __init__(self):
+        self.w3 = AsyncWeb3(AsyncHTTPProvider(settings.blockchain_rpc_url))
+        self.account = Account.from_key(settings.platform_wallet_private_key)
+        self.nonces = NonceManager(self.w3, self.account.address)
+        self.token = self.w3.eth.contract(
+            address=AsyncWeb3.to_checksum_address(settings.mentorship_token_address),
+            abi=MENTORSHIP_TOKEN_ABI
+        )
+        # Pending transactions keyed by id: nonce, gas, gas price and every hash sent for that nonce
+        self.pending: Dict[ObjectId, Dict[str, Any]] = {}
+        self.chain_id: Optional[int] = None
+        self._wakeup = asyncio.Event()
+        self._leader = LeaderTask(MongoLease("tx_relay", settings.leader_lease_seconds), self._relay)
+
+    @property
+    def collection(self):
+        return database.db.transactions
+
+    def start(self) -> None:
+        """Compete for the relay lease; the holder sends the queued transactions"""
+        self._leader.start()
+        logger.info(f"Transaction queue started for {self.account.address}")
+
+    async def stop(self) -> None:
+        await self._leader.stop()
+
+    def _track(self, tx_id: ObjectId, doc: Dict[str, Any]) -> None:
+        metadata = doc.get("metadata") or {}
+        self.pending[tx_id] = {
+            "nonce": doc["nonce"],
+            "gas": doc["gas"],
+            "gas_price": doc["gas_price"],
+            "tx_hashes": list(doc["tx_hashes"]),
+            "sent_at": time.monotonic(),
+            "replacements": doc.get("replacements", 0),
+            "filler": doc.get("type") == "nonce_filler",
+            # Hashes of the failed transaction a filler took the nonce of
+            "cancels": ObjectId(metadata["cancels"]) if metadata.get("cancels") else None,
+            "cancelled_hashes": list(metadata.get("cancelled_hashes", [])),
+        }
+
+    async def _recover(self) -> None:
+        """Take over the transactions left unfinished by the previous leader"""
+        # Claimed but never signed, so never sent: safe to send again. Fillers
+        # already own their nonce and are re-sent by the poller instead.
+        await self.collection.update_many(
+            {"status": "sending", "type": {"$ne": "nonce_filler"}, "tx_hashes": {"$size": 0}},
+            {"$set": {"status": "queued", "updated_at": datetime.utcnow()}}
+        )
+        # Signed transactions may have reached the network; the poller
+        # finds their receipts or re-sends them once they look stuck
+        async for doc in self.collection.find({"status": {"$in": ["sending", "pending"]}}):
+            self._track(doc["_id"], doc)
+            if doc["status"] == "sending":
+                await self._update(doc["_id"], {"status": "pending"})
+
+    async def _relay(self) -> None:
+        """Send queued transactions while this process holds the relay lease"""
+        self.chain_id = await self.w3.eth.chain_id
+        await self.nonces.sync()
+        self.pending = {}
+        await db_guard.run("background", self._recover)
+
+        tasks = [asyncio.create_task(self._worker()) for _ in range(settings.tx_max_in_flight)]
+        tasks.append(asyncio.create_task(self._poll_receipts()))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def submit(self, tx_type: str, user_id: str, function: str, args: List[Any],
+                     metadata: Optional[Dict[str, Any]] = None) -> str:
+        """Persist a contract call and queue it for sending. Returns the transaction id"""
+        now = datetime.utcnow()
+        result = await self.collection.insert_one({
+            "user_id": user_id,
+            "type": tx_type,
+            "status": "queued",
+            "function": function,
+            "args": [str(arg) if isinstance(arg, int) else arg for arg in args],
+            "metadata": metadata or {},
+            "attempts": 0,
+            "tx_hashes": [],
+            "created_at": now,
+            "updated_at": now,
+        })
+        # Only wakes the relay when this process is the leader; otherwise
+        # the leader finds the transaction on its next poll
+        self._wakeup.set()
+        return str(result.inserted_id)
+
+    async def submit_session_payment(self, user_id: str, mentor: str, mentee: str, amount: int,
+                                     metadata: Optional[Dict[str, Any]] = None) -> str:
+        return await self.submit(
+            "session_payment",
+            user_id,
+            "processSessionPayment",
+            [AsyncWeb3.to_checksum_address(mentor), AsyncWeb3.to_checksum_address(mentee), amount],
+            metadata
+        )
+
+    async def _update(self, tx_id: ObjectId, fields: Dict[str, Any]) -> None:
+        fields["updated_at"] = datetime.utcnow()
+        await db_guard.run("background", lambda: self.collection.update_one({"_id": tx_id}, {"$set": fields}))
+
+    def _contract_call(self, doc: Dict[str, Any]):
+        # uint256 arguments are stored as strings to stay within BSON integer range
+        args = [int(arg) if isinstance(arg, str) and arg.isdigit() else arg for arg in doc["args"]]
+        return self.token.get_function_by_name(doc["function"])(*args)
+
+    async def _build(self, doc: Dict[str, Any], nonce: int, gas: int, gas_price: int) -> Dict[str, Any]:
+        fields = {"nonce": nonce, "gas": gas, "gasPrice": gas_price, "chainId": self.chain_id}
+        if doc["type"] == "nonce_filler":
+            # A zero-value transfer to itself uses up the nonce and nothing else
+            return {**fields, "to": self.account.address, "value": 0}
+        return await self._contract_call(doc).build_transaction({"from": self.account.address, **fields})
+
+    async def _sign_and_send(self, tx_id: ObjectId, tx: Dict[str, Any]) -> str:
+        signed = self.account.sign_transaction(tx)
+        tx_hash = signed.hash.hex()
+        # Recorded before sending, so a leader taking over after a crash
+        # mid-send still watches the hash instead of sending the call again
+        await db_guard.run("background", lambda: self.collection.update_one(
+            {"_id": tx_id},
+            {
+                "$set": {
+                    "nonce": tx["nonce"],
+                    "gas": tx["gas"],
+                    "gas_price": tx["gasPrice"],
+                    "tx_hash": tx_hash,
+                    "updated_at": datetime.utcnow()
+                },
+                "$addToSet": {"tx_hashes": tx_hash}
+            }
+        ))
+        await self.w3.eth.send_raw_transaction(signed.rawTransaction)
+        return tx_hash
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically take the oldest queued transaction"""
+        return await db_guard.run("background", lambda: self.collection.find_one_and_update(
+            {"status": "queued"},
+            {"$set": {"status": "sending", "updated_at": datetime.utcnow()}},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        ))
+
+    async def _send(self, doc: Dict[str, Any]) -> None:
+        tx_id = doc["_id"]
+        function = self._contract_call(doc)
+
+        try:
+            gas = await function.estimate_gas({"from": self.account.address})
+        except Exception as e:
+            # A call that reverts in simulation will revert on chain too
+            await self._update(tx_id, {"status": "failed", "error": str(e)})
+            return
+
+        nonce = await self.nonces.allocate()
+        gas_price = await self.w3.eth.gas_price
+
+        for attempt in range(1, settings.tx_max_retries + 1):
+            tx = await self._build(doc, nonce, gas, gas_price)
+            try:
+                tx_hash = await self._sign_and_send(tx_id, tx)
+            except Exception as e:
+                if "nonce too low" in str(e).lower():
+                    # The wallet was used outside the queue; start again from the node's count
+                    await self.nonces.sync()
+                    nonce = await self.nonces.allocate()
+                logger.warning(f"Sending transaction {tx_id} failed (attempt {attempt}): {str(e)}")
+                await self._update(tx_id, {"attempts": attempt, "error": str(e)})
+                await asyncio.sleep(2 ** attempt)
+                continue
+
+            self._track(tx_id, {**doc, "nonce": nonce, "gas": gas, "gas_price": gas_price, "tx_hashes": [tx_hash]})
+            await self._update(tx_id, {
+                "status": "pending",
+                "attempts": attempt,
+                "submitted_at": datetime.utcnow(),
+            })
+            return
+
+        await self._update(tx_id, {"status": "failed"})
+        # Later transactions may already hold the nonces after this one. A
+        # failed send may still have reached the network, so its hashes are
+        # watched too.
+        failed = await db_guard.run("background", lambda: self.collection.find_one({"_id": tx_id}))
+        await self._fill_nonce(nonce, int(gas_price * GAS_PRICE_BUMP), tx_id, failed.get("tx_hashes", []))
+
+    async def _fill_nonce(
+        self,
+        nonce: int,
+        gas_price: int,
+        cancels: Optional[ObjectId] = None,
+        cancelled_hashes: Optional[List[str]] = None
+    ) -> None:
+        """Use up a nonce that would otherwise block every later transaction"""
+        now = datetime.utcnow()
+        doc = {
+            "user_id": None,
+            "type": "nonce_filler",
+            "status": "sending",
+            "function": None,
+            "args": [],
+            "metadata": {"cancels": str(cancels), "cancelled_hashes": cancelled_hashes or []} if cancels else {},
+            "attempts": 1,
+            "nonce": nonce,
+            "gas": FILLER_GAS,
+            "gas_price": gas_price,
+            "tx_hashes": [],
+            "created_at": now,
+            "updated_at": now,
+        }
+        result = await db_guard.run("background", lambda: self.collection.insert_one(doc))
+        tx_id = result.inserted_id
+
+        try:
+            await self._sign_and_send(tx_id, await self._build(doc, nonce, FILLER_GAS, gas_price))
+        except Exception as e:
+            # Tracked all the same: the poller re-sends it once it looks stuck
+            logger.warning(f"Sending filler for nonce {nonce} failed: {str(e)}")
+
+        self._track(tx_id, await db_guard.run("background", lambda: self.collection.find_one({"_id": tx_id})))
+        await self._update(tx_id, {"status": "pending", "submitted_at": datetime.utcnow()})
+        logger.warning(f"Filling nonce {nonce} with a self-transfer" + (f" in place of {cancels}" if cancels else ""))
+
+    async def _abandon(self, tx_id: ObjectId, entry: Dict[str, Any]) -> None:
+        """Give up on a transaction still unmined after every replacement"""
+        self.pending.pop(tx_id, None)
+        error = f"Stalled after {entry['replacements']} replacements"
+        await self._update(tx_id, {"status": "failed", "error": error})
+
+        if entry["filler"]:
+            # Filling it again would only repeat this; the wallet needs attention
+            logger.error(
+                f"Filler {tx_id} for nonce {entry['nonce']} stalled; "
+                f"later platform wallet transactions stay blocked until the nonce is used"
+            )
+            return
+
+        logger.warning(f"Transaction {tx_id} stalled at nonce {entry['nonce']}; replacing it with a filler")
+        await self._fill_nonce(
+            entry["nonce"],
+            int(entry["gas_price"] * GAS_PRICE_BUMP),
+            tx_id,
+            entry["tx_hashes"] + entry["cancelled_hashes"]
+        )
+
+    async def _worker(self) -> None:
+        while True:
+            self._wakeup.clear()
+            doc = await self._claim()
+            if doc is None:
+                # Sleep until a local submission arrives or the next poll
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.tx_receipt_poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._send(doc)
+            except Exception as e:
+                logger.error(f"Unexpected error sending transaction {doc['_id']}: {str(e)}", exc_info=True)
+                if doc["_id"] not in self.pending:
+                    await self._update(doc["_id"], {"status": "failed", "error": str(e)})
+
+    async def _receipt(self, tx_hash: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            return None
+
+    async def _replace(self, tx_id: ObjectId, entry: Dict[str, Any]) -> None:
+        """Re-send a stuck transaction with the same nonce and a higher gas price"""
+        doc = await db_guard.run("background", lambda: self.collection.find_one({"_id": tx_id}))
+
+        gas_price = max(int(entry["gas_price"] * GAS_PRICE_BUMP), await self.w3.eth.gas_price)
+        tx = await self._build(doc, entry["nonce"], entry["gas"], gas_price)
+        try:
+            tx_hash = await self._sign_and_send(tx_id, tx)
+        except Exception as e:
+            logger.warning(f"Replacing transaction {tx_id} failed: {str(e)}")
+            entry["sent_at"] = time.monotonic()
+            return
+
+        entry["gas_price"] = gas_price
+        entry["tx_hashes"].append(tx_hash)
+        entry["sent_at"] = time.monotonic()
+        entry["replacements"] += 1
+        logger.info(f"Replaced stuck transaction {tx_id} with {tx_hash} at gas price {gas_price}")
+        await self._update(tx_id, {"replacements": entry["replacements"]})
+
+    async def _poll_once(self) -> None:
+        if not self.pending:
+            return
+
+        # Every hash sent for every pending nonce is checked in one concurrent sweep
+        lookups = [
+            (tx_id, tx_hash)
+            for tx_id, entry in self.pending.items()
+            for tx_hash in entry["tx_hashes"] + entry["cancelled_hashes"]
+        ]
+        receipts = await asyncio.gather(
+            *(self._receipt(tx_hash) for _, tx_hash in lookups),
+            return_exceptions=True
+        )
+
+        mined: Dict[ObjectId, Dict[str, Any]] = {}
+        for (tx_id, tx_hash), receipt in zip(lookups, receipts):
+            if receipt and not isinstance(receipt, Exception):
+                mined[tx_id] = receipt
+
+        for tx_id, receipt in mined.items():
+            entry = self.pending.pop(tx_id)
+            mined_hash = receipt["transactionHash"].hex()
+            fields = {
+                "status": "confirmed" if receipt["status"] == 1 else "reverted",
+                "tx_hash": mined_hash,
+                "block_number": receipt["blockNumber"],
+                "gas_used": receipt["gasUsed"],
+                "confirmed_at": datetime.utcnow(),
+            }
+            if entry["cancels"] and mined_hash in entry["cancelled_hashes"]:
+                # The failed transaction was mined before its filler after all
+                await self._update(entry["cancels"], {**fields, "error": None})
+                await self._update(tx_id, {"status": "dropped"})
+            else:
+                await self._update(tx_id, fields)
+
+        now = time.monotonic()
+        for tx_id, entry in list(self.pending.items()):
+            if now - entry["sent_at"] < settings.tx_stuck_timeout_seconds:
+                continue
+            if entry["replacements"] < settings.tx_max_retries:
+                await self._replace(tx_id, entry)
+            else:
+                await self._abandon(tx_id, entry)
+
+    async def _poll_receipts(self) -> None:
+        while True:
+            try:
+                await self._poll_once()
+            except Exception as e:
+                logger.error(f"Error polling transaction receipts: {str(e)}", exc_info=True)
+            await asyncio.sleep(settings.tx_receipt_poll_interval_seconds)
+
+# Global queue instance, created when a platform wallet is configured
+_tx_queue: Optional[TransactionQueue] = None
+
+def get_tx_queue() -> Optional[TransactionQueue]:
+    """Get the transaction queue, or None if relaying is not configured"""
+    return _tx_queue
+
+async def start_tx_queue() -> None:
+    global _tx_queue
+
+    if not (settings.platform_wallet_private_key and settings.mentorship_token_address):
+        logger.info("Platform wallet not configured. Transaction relaying is disabled.")
+        return
+
+    _tx_queue = TransactionQueue()
+    _tx_queue.start()
+
+async def stop_tx_queue() -> None:
+    global _tx_queue
+
+    if _tx_queue:
+        await _tx_queue.stop()
+        _tx_queue = None
+
+async def get_transaction(tx_id: str) -> Optional[Dict[str, Any]]:
+    """Persisted status of a relayed transaction"""
+    if not ObjectId.is_valid(tx_id):
+        return None
+    doc = await database.db.transactions.find_one({"_id": ObjectId(tx_id)})
+    if doc:
+        doc["_id"] = str(doc["_id"])
+    return doc
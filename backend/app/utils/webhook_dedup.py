@@ -0,0 +1,68 @@
+import hashlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from app.config import database
+from app.config.settings import get_settings
+
+settings = get_settings()
+
+# Headers providers use to identify a delivery across retries
+EVENT_ID_HEADERS = ("X-Event-Id", "Idempotency-Key")
+
+class RecentKeys:
+    """Bounded LRU set of recently seen delivery keys"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._keys: "OrderedDict[str, None]" = OrderedDict()
+
+    def __contains__(self, key: str) -> bool:
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return True
+        return False
+
+    def add(self, key: str) -> None:
+        self._keys[key] = None
+        self._keys.move_to_end(key)
+        if len(self._keys) > self.size:
+            self._keys.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        self._keys.pop(key, None)
+
+recent_keys = RecentKeys(settings.webhook_dedup_window)
+
+def delivery_key(source: str, event_id: Optional[str], body: bytes) -> str:
+    """Dedup key of a delivery: the provider event ID, or a digest of the body"""
+    if event_id:
+        return f"{source}:id:{event_id}"
+    return f"{source}:sha256:{hashlib.sha256(body).hexdigest()}"
+
+async def claim_delivery(key: str) -> bool:
+    """
+    Record a delivery key, returning False if it was already seen
+
+    Recent keys are answered from memory; the unique _id of the
+    webhook_events collection is the authority across workers and restarts.
+    """
+    if key in recent_keys:
+        return False
+
+    try:
+        await database.db.webhook_events.insert_one({"_id": key, "created_at": datetime.utcnow()})
+    except DuplicateKeyError:
+        recent_keys.add(key)
+        return False
+
+    recent_keys.add(key)
+    return True
+
+async def release_delivery(key: str) -> None:
+    """Forget a claimed key so a redelivery is accepted (used when enqueueing fails)"""
+    recent_keys.discard(key)
+    await database.db.webhook_events.delete_one({"_id": key})
@@ -0,0 +1,333 @@
+import asyncio
+import hashlib
+import hmac
+import itertools
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import orjson
+from bson.binary import Binary
+
+from app.config import database
+from app.config.settings import get_settings
+from app.utils.db_guard import db_guard
+from app.utils.leases import LeaderTask, MongoLease
+from app.utils.logging import get_logger
+
+settings = get_settings()
+logger = get_logger("webhooks.queue")
+
+# A handler receives the parsed events of a batch of deliveries for its source
+WebhookHandler = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+# Registered handlers keyed by source, with the number of workers draining it
+_handlers: Dict[str, WebhookHandler] = {}
+_concurrency: Dict[str, int] = {}
+# Sources applied strictly in arrival order, with the coroutine that loads
+# their state when a process takes over consuming them
+_ordered: Dict[str, Optional[Callable[[], Awaitable[None]]]] = {}
+
+class WebhookRejected(Exception):
+    """Raised by a handler for a delivery that can never be applied; it is dead-lettered without retries"""
+
+def register_webhook_handler(
+    source: str,
+    concurrency: Optional[int] = None,
+    ordered: bool = False,
+    on_takeover: Optional[Callable[[], Awaitable[None]]] = None
+):
+    """
+    Register the coroutine that processes queued deliveries of a source
+
+    Sources whose events must be applied in arrival order (such as chain
+    blocks) are registered as `ordered`: a single consumer across all
+    processes, elected with a lease, applies them one after another and
+    never moves past a delivery waiting for its retry. `on_takeover` runs
+    whenever a process becomes that consumer.
+    """
+    def decorator(func: WebhookHandler) -> WebhookHandler:
+        _handlers[source] = func
+        if ordered:
+            _ordered[source] = on_takeover
+        else:
+            _concurrency[source] = concurrency or settings.webhook_workers
+        return func
+    return decorator
+
+def verify_signature(secret: Optional[str], body: bytes, signature: Optional[str]) -> bool:
+    """
+    Check an HMAC-SHA256 signature of the raw request body
+    Accepts both bare hex digests and the `sha256=<hex>` form
+    """
+    if not secret:
+        # Unsigned webhooks are only accepted outside production
+        return settings.environment != "production"
+    if not signature:
+        return False
+
+    if signature.startswith("sha256="):
+        signature = signature[len("sha256="):]
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+def parse_payload(body: bytes) -> List[Dict[str, Any]]:
+    """
+    Parse a verified delivery into its events
+
+    A delivery is a single JSON object, a JSON array of objects, or
+    newline-delimited JSON, so one request can carry many events.
+    """
+    try:
+        # Also covers pretty-printed JSON, whose newlines are not record separators
+        events = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        if b"\n" not in body.strip():
+            raise
+        events = [orjson.loads(line) for line in body.splitlines() if line.strip()]
+    if not isinstance(events, list):
+        events = [events]
+
+    if not all(isinstance(event, dict) for event in events):
+        raise ValueError("Webhook events must be JSON objects")
+    return events
+
+class WebhookWorkerPool:
+    """
+    Drains the durable webhook_queue collection in the background
+
+    Intake only inserts the raw body, so request latency does not depend on
+    processing cost. Workers claim deliveries in batches, retry failed ones
+    with exponential backoff and move them to webhook_dead_letter after
+    `webhook_max_attempts` attempts. Deliveries claimed by a worker that
+    died are picked up again once their lock expires. Ordered sources have
+    a single consumer that holds their lease instead of a set of workers.
+    """
+
+    def __init__(self):
+        self._tasks: List[asyncio.Task] = []
+        self._leaders: List[LeaderTask] = []
+        self._wakeup: Dict[str, asyncio.Event] = {}
+
+    @property
+    def queue(self):
+        return database.db.webhook_queue
+
+    async def enqueue(self, source: str, body: bytes) -> str:
+        """Persist a verified delivery and wake the workers of its source"""
+        now = datetime.utcnow()
+        result = await self.queue.insert_one({
+            "source": source,
+            "payload": Binary(body),
+            "status": "pending",
+            "attempts": 0,
+            "available_at": now,
+            "created_at": now,
+        })
+        if source in self._wakeup:
+            self._wakeup[source].set()
+        return str(result.inserted_id)
+
+    async def _claim(self, source: str) -> List[Dict[str, Any]]:
+        """Claim up to a batch of due deliveries for this worker"""
+        now = datetime.utcnow()
+        due = {
+            "source": source,
+            "$or": [
+                {"status": "pending", "available_at": {"$lte": now}},
+                {"status": "processing", "locked_until": {"$lt": now}},
+            ]
+        }
+        candidates = await self.queue.find(
+            due,
+            projection={"_id": 1},
+            sort=[("created_at", 1)],
+            limit=settings.webhook_batch_size
+        ).to_list(length=settings.webhook_batch_size)
+        if not candidates:
+            return []
+
+        # The claim token makes the update safe against workers in other processes
+        claim = uuid.uuid4().hex
+        await self.queue.update_many(
+            {"_id": {"$in": [c["_id"] for c in candidates]}, **due},
+            {"$set": {
+                "status": "processing",
+                "claim": claim,
+                "locked_until": now + timedelta(seconds=settings.webhook_lock_seconds),
+            }}
+        )
+        return await self.queue.find({"claim": claim}, sort=[("created_at", 1)]).to_list(
+            length=settings.webhook_batch_size
+        )
+
+    async def _fail(self, deliveries: List[Dict[str, Any]], error: str, permanent: bool = False) -> None:
+        now = datetime.utcnow()
+        max_attempts = 1 if permanent else settings.webhook_max_attempts
+        dead = [d for d in deliveries if d["attempts"] + 1 >= max_attempts]
+        retry = [d for d in deliveries if d["attempts"] + 1 < max_attempts]
+
+        if dead:
+            await database.db.webhook_dead_letter.insert_many([
+                {
+                    **{k: v for k, v in d.items() if k != "events"},
+                    "attempts": d["attempts"] + 1,
+                    "error": error,
+                    "failed_at": now
+                }
+                for d in dead
+            ])
+            await self.queue.delete_many({"_id": {"$in": [d["_id"] for d in dead]}})
+            logger.error(f"Moved {len(dead)} {dead[0]['source']} webhooks to the dead letter collection: {error}")
+
+        for delivery in retry:
+            attempts = delivery["attempts"] + 1
+            delay = settings.webhook_retry_base_seconds * (2 ** (attempts - 1))
+            await self.queue.update_one(
+                {"_id": delivery["_id"]},
+                {"$set": {
+                    "status": "pending",
+                    "attempts": attempts,
+                    "error": error,
+                    "available_at": now + timedelta(seconds=delay * random.uniform(1, 1.5)),
+                }, "$unset": {"claim": "", "locked_until": ""}}
+            )
+
+    async def _handle_error(self, source: str, deliveries: List[Dict[str, Any]], error: Exception) -> None:
+        if isinstance(error, WebhookRejected):
+            await db_guard.run("background", lambda: self._fail(deliveries, str(error), permanent=True))
+            return
+        logger.warning(f"Processing {source} webhook failed: {str(error)}", exc_info=True)
+        await db_guard.run("background", lambda: self._fail(deliveries, str(error)))
+
+    async def _process(self, source: str, claimed: List[Dict[str, Any]], ordered: bool = False) -> None:
+        handler = _handlers[source]
+
+        # Unparseable payloads will never succeed, so they skip the retries
+        deliveries = []
+        for delivery in claimed:
+            try:
+                delivery["events"] = parse_payload(bytes(delivery["payload"]))
+                deliveries.append(delivery)
+            except ValueError as e:
+                error = f"Invalid payload: {str(e)}"
+                await db_guard.run("background", lambda: self._fail([delivery], error, permanent=True))
+        if not deliveries:
+            return
+
+        try:
+            await handler([event for d in deliveries for event in d["events"]])
+            done = deliveries
+        except Exception as e:
+            if len(deliveries) == 1:
+                await self._handle_error(source, deliveries, e)
+                return
+
+            # Retry the batch one delivery at a time so a single bad payload
+            # does not hold back the rest, unless the source is ordered
+            done = []
+            for delivery in deliveries:
+                try:
+                    await handler(delivery["events"])
+                    done.append(delivery)
+                except Exception as e:
+                    await self._handle_error(source, [delivery], e)
+                    if ordered:
+                        break
+
+        if done:
+            await db_guard.run("background", lambda: self.queue.delete_many({"_id": {"$in": [d["_id"] for d in done]}}))
+
+    async def _worker(self, source: str) -> None:
+        wakeup = self._wakeup[source]
+        while True:
+            wakeup.clear()
+            try:
+                deliveries = await db_guard.run("background", lambda: self._claim(source))
+                if deliveries:
+                    await self._process(source, deliveries)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Webhook worker for {source} failed: {str(e)}", exc_info=True)
+
+            # Sleep until new work arrives or a retry may be due
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=settings.webhook_poll_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _ordered_worker(self, source: str) -> None:
+        """Apply the deliveries of an ordered source strictly one after another"""
+        on_takeover = _ordered[source]
+        if on_takeover:
+            await on_takeover()
+
+        # The only consumer of the source, so deliveries are read in place
+        # instead of claimed
+        wakeup = self._wakeup[source]
+        while True:
+            wakeup.clear()
+            delay = settings.webhook_poll_interval_seconds
+            try:
+                oldest = await db_guard.run("background", lambda: self.queue.find(
+                    {"source": source},
+                    sort=[("created_at", 1), ("_id", 1)],
+                    limit=settings.webhook_batch_size
+                ).to_list(length=settings.webhook_batch_size))
+                now = datetime.utcnow()
+                # Nothing is applied past a delivery still waiting for its retry
+                due = list(itertools.takewhile(lambda d: d["available_at"] <= now, oldest))
+                if due:
+                    await self._process(source, due, ordered=True)
+                    continue
+                if oldest:
+                    delay = min(delay, (oldest[0]["available_at"] - now).total_seconds())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Webhook consumer for {source} failed: {str(e)}", exc_info=True)
+
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        for source, concurrency in _concurrency.items():
+            self._wakeup[source] = asyncio.Event()
+            self._tasks.extend(
+                asyncio.create_task(self._worker(source)) for _ in range(concurrency)
+            )
+        for source in _ordered:
+            self._wakeup[source] = asyncio.Event()
+            leader = LeaderTask(
+                MongoLease(f"webhooks:{source}", settings.leader_lease_seconds),
+                lambda source=source: self._ordered_worker(source)
+            )
+            leader.start()
+            self._leaders.append(leader)
+        logger.info(f"Webhook workers started: {dict(_concurrency)}, ordered: {list(_ordered)}")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for leader in self._leaders:
+            await leader.stop()
+        self._leaders = []
+
+    async def stats(self) -> Dict[str, Any]:
+        """Queue depth per source and status"""
+        counts = await self.queue.aggregate([
+            {"$group": {"_id": {"source": "$source", "status": "$status"}, "count": {"$sum": 1}}}
+        ]).to_list(length=None)
+        return {
+            "queue": [{**c["_id"], "count": c["count"]} for c in counts],
+            "dead_letter": await database.db.webhook_dead_letter.estimated_document_count(),
+        }
+
+webhook_pool = WebhookWorkerPool()
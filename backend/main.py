@@ -1,13 +1,21 @@
 import uvicorn
 from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config.database import connect_to_mongodb, close_mongodb_connection
 from app.routes import auth, users, sessions, webhooks, blockchain, admin
-from app.utils.middleware import ErrorHandlerMiddleware, RateLimitMiddleware
+from app.utils.middleware import ErrorHandlerMiddleware, LoadSheddingMiddleware, MetricsMiddleware, RateLimitMiddleware, rate_limiter
 from app.utils.sentry import init_sentry
 from app.utils.scheduler import setup_scheduler, shutdown_scheduler
 from app.utils.db_indexes import create_indexes
+from app.utils.chain_buffer import confirmation_buffer
+from app.utils.tx_queue import start_tx_queue, stop_tx_queue
+from app.utils.webhook_queue import webhook_pool
+from app.utils.access_log import access_log_sampler
+from app.utils.metrics import metrics_registry
+from app.utils.dashboard import dashboard_snapshot
+from app.utils.active_users import active_user_tracker
 from app.config.settings import get_settings
 
 settings = get_settings()
@@ -27,7 +35,9 @@ app = FastAPI(
 
 # Middleware
 app.add_middleware(ErrorHandlerMiddleware)
+app.add_middleware(LoadSheddingMiddleware)
 app.add_middleware(RateLimitMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # CORS setup
 app.add_middleware(
@@ -47,12 +57,42 @@ async def startup_db_client():
     # Create indexes
     await create_indexes()
     
+    # Resume chain event ingestion from the last finalized block
+    await confirmation_buffer.load_cursor()
+    
+    # Start relaying platform wallet transactions
+    await start_tx_queue()
+    
+    # Start draining queued webhook deliveries
+    webhook_pool.start()
+    
+    # Share this worker's metrics with the others
+    metrics_registry.start()
+    
+    # Keep the admin dashboard statistics precomputed
+    dashboard_snapshot.start()
+    
+    # Persist active user sketches periodically
+    active_user_tracker.start()
+    
+    # Summarize unsampled requests periodically
+    access_log_sampler.start()
+    
     # Set up scheduler for background tasks
     if settings.environment == "production":
         setup_scheduler()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Stop background workers before the database goes away
+    await webhook_pool.stop()
+    await dashboard_snapshot.stop()
+    await active_user_tracker.stop()
+    await stop_tx_queue()
+    await rate_limiter.close()
+    await access_log_sampler.stop()
+    await metrics_registry.stop()
+    
     # Close MongoDB connection
     await close_mongodb_connection()
     
@@ -73,6 +113,13 @@ async def health_check():
         "version": "1.0.0"
     }
 
+# Prometheus metrics endpoint
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def metrics():
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics are disabled")
+    return PlainTextResponse(await metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 # Include routers
 app.include_router(auth.router, prefix="/api", tags=["Authentication"])
 app.include_router(users.router, prefix="/api", tags=["Users"])
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark the rate limit and error handler middleware
+
+Run from the backend directory:
+
+    python scripts/bench_middleware.py none
+    python scripts/bench_middleware.py middleware
+
+`none` serves /health from a bare FastAPI app; `middleware` wraps it in
+RateLimitMiddleware and ErrorHandlerMiddleware. The app is called
+directly as an ASGI callable, so no server or network time is included.
+To measure the BaseHTTPMiddleware versions, run the script on a checkout
+from before the pure ASGI rewrite.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi import FastAPI  # noqa: E402
+
+from app.config.settings import get_settings  # noqa: E402
+from app.utils import middleware  # noqa: E402
+
+REQUESTS = 10_000
+WARMUP = 200
+
+SCOPE = {
+    "type": "http",
+    "asgi": {"version": "3.0"},
+    "http_version": "1.1",
+    "method": "GET",
+    "scheme": "http",
+    "path": "/health",
+    "raw_path": b"/health",
+    "query_string": b"",
+    "root_path": "",
+    "headers": [(b"host", b"bench")],
+    "server": ("bench", 80),
+}
+
+def build_app(with_middleware: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    if with_middleware:
+        app.add_middleware(middleware.ErrorHandlerMiddleware)
+        app.add_middleware(middleware.RateLimitMiddleware)
+    return app
+
+def make_receive():
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Like a client that keeps the connection open
+        await asyncio.sleep(3600)
+
+    return receive
+
+async def send(message):
+    pass
+
+async def run(app: FastAPI, count: int) -> None:
+    for i in range(count):
+        # Spread requests over many clients so none is rate limited
+        scope = dict(SCOPE, client=(f"10.0.{i % 250}.{i // 250 % 250}", 1))
+        await app(scope, make_receive(), send)
+
+async def main(mode: str) -> None:
+    app = build_app(mode == "middleware")
+    await run(app, WARMUP)
+    started = time.perf_counter()
+    await run(app, REQUESTS)
+    elapsed = time.perf_counter() - started
+    print(f"{mode}: {elapsed / REQUESTS * 1e6:.1f} us/request")
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else "middleware"
+    if mode not in ("none", "middleware"):
+        sys.exit("usage: bench_middleware.py [none|middleware]")
+
+    logging.getLogger("middleware").setLevel(logging.CRITICAL)
+    get_settings().rate_limit_enabled = True
+    asyncio.run(main(mode))
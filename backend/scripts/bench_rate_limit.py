@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark the in-memory rate limiter
+
+Run from the backend directory:
+
+    python scripts/bench_rate_limit.py
+
+Each key is checked once, then random keys are checked again. The hot key
+case compares against the list-of-timestamps store the limiter replaced,
+reproduced below as ListStore, with the calls the middleware made.
+"""
+
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.utils.rate_limit import InMemoryRateLimiter  # noqa: E402
+
+WINDOW_SECONDS = 900
+LIMIT = 100
+REPEATS = 200_000
+
+class ListStore:
+    """The replaced store: every request timestamp per key"""
+
+    def __init__(self):
+        self.store: Dict[str, List[float]] = {}
+
+    async def get_requests(self, key: str) -> List[float]:
+        if key not in self.store:
+            self.store[key] = []
+        return self.store[key]
+
+    async def add_request(self, key: str, timestamp: float):
+        if key not in self.store:
+            self.store[key] = []
+        self.store[key].append(timestamp)
+
+    async def clean_old_requests(self, key: str, window_ms: int):
+        if key not in self.store:
+            return
+        cutoff = time.time() - (window_ms / 1000)
+        self.store[key] = [t for t in self.store[key] if t > cutoff]
+
+    async def check(self, key: str, limit: int, window_seconds: float) -> bool:
+        current_time = time.time()
+        await self.clean_old_requests(key, int(window_seconds * 1000))
+        if len(await self.get_requests(key)) >= limit:
+            return False
+        await self.add_request(key, current_time)
+        return True
+
+def per_check_us(check, keys: List[str]) -> float:
+    started = time.perf_counter()
+    for key in keys:
+        check(key)
+    return (time.perf_counter() - started) / len(keys) * 1e6
+
+def bench_keys(count: int) -> None:
+    limiter = InMemoryRateLimiter(max_keys=count)
+    keys = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(count)]
+    check = lambda key: limiter.check(key, LIMIT, WINDOW_SECONDS)
+
+    for key in keys:
+        check(key)
+    repeats = [random.choice(keys) for _ in range(REPEATS)]
+    print(f"{count} keys: {per_check_us(check, repeats):.1f} us/check, {len(limiter)} entries")
+
+async def per_hit_us(hit, keys: List[str]) -> float:
+    started = time.perf_counter()
+    for key in keys:
+        await hit(key)
+    return (time.perf_counter() - started) / len(keys) * 1e6
+
+async def bench_hot_key() -> None:
+    # The list store is at its limit, so every check filters `LIMIT` timestamps
+    keys = ["hot"] * REPEATS
+    limiter = InMemoryRateLimiter()
+    store = ListStore()
+    new = await per_hit_us(lambda key: limiter.hit(key, LIMIT, WINDOW_SECONDS), keys)
+    old = await per_hit_us(lambda key: store.check(key, LIMIT, WINDOW_SECONDS), keys)
+    print(f"hot single key: {new:.1f} us/check, list store: {old:.1f} us/check")
+
+def bench_eviction(count: int, max_keys: int) -> None:
+    limiter = InMemoryRateLimiter(max_keys=max_keys)
+    for i in range(count):
+        limiter.check(f"client-{i}", LIMIT, WINDOW_SECONDS)
+    print(f"{count} distinct clients with max_keys={max_keys}: {len(limiter)} entries")
+
+if __name__ == "__main__":
+    print(f"Python {sys.version.split()[0]}")
+    for count in (10_000, 100_000, 1_000_000):
+        bench_keys(count)
+    asyncio.run(bench_hot_key())
+    bench_eviction(1_000_000, 100_000)
@@ -0,0 +1,106 @@
+import asyncio
+
+import fakeredis.aioredis
+import pytest
+
+from app.utils import rate_limit
+from app.utils.rate_limit import InMemoryRateLimiter, RedisRateLimiter, SLIDING_WINDOW_SCRIPT
+
+WINDOW = 60
+LIMIT = 20
+
+class Clock:
+    """Stands in for time.time so windows can be crossed without waiting"""
+
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Start exactly on a window boundary
+    clock = Clock(1_000 * WINDOW)
+    monkeypatch.setattr(rate_limit.time, "time", clock)
+    return clock
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+def redis_limiter(server, local_batch: int = 0) -> RedisRateLimiter:
+    """A limiter on a fake Redis; limiters sharing `server` act like separate processes"""
+    limiter = RedisRateLimiter("redis://localhost", local_batch=local_batch)
+    limiter.client = fakeredis.aioredis.FakeRedis(server=server)
+    limiter.script = limiter.client.register_script(SLIDING_WINDOW_SCRIPT)
+    return limiter
+
+async def allowed(limiter, requests: int, key: str = "k") -> int:
+    results = [await limiter.hit(key, LIMIT, WINDOW) for _ in range(requests)]
+    return sum(result.allowed for result in results)
+
+def test_in_memory_sliding_window(clock):
+    limiter = InMemoryRateLimiter()
+    assert asyncio.run(allowed(limiter, LIMIT + 5)) == LIMIT
+
+    denied = limiter.check("k", LIMIT, WINDOW)
+    assert not denied.allowed and denied.retry_after == pytest.approx(WINDOW)
+
+    # Halfway through the next window, half of the previous one still counts
+    clock.now += WINDOW * 1.5
+    assert asyncio.run(allowed(limiter, LIMIT)) == LIMIT // 2
+
+def test_redis_sliding_window(clock, server):
+    async def scenario():
+        limiter = redis_limiter(server)
+        first = await allowed(limiter, LIMIT + 5)
+        clock.now += WINDOW * 1.5
+        second = await allowed(limiter, LIMIT)
+        other_key = await allowed(limiter, 1, key="other")
+        return first, second, other_key
+
+    assert asyncio.run(scenario()) == (LIMIT, LIMIT // 2, 1)
+
+def test_redis_limit_is_shared_between_processes(clock, server):
+    async def scenario():
+        workers = [redis_limiter(server) for _ in range(3)]
+        return [await allowed(worker, 10) for worker in workers]
+
+    assert sum(asyncio.run(scenario())) == LIMIT
+
+async def interleaved(server, local_batch: int, requests: int):
+    """Requests from two processes in turn; returns (allowed, Redis calls)"""
+    workers = [redis_limiter(server, local_batch) for _ in range(2)]
+    calls = 0
+    for worker in workers:
+        async def counted(*args, original=worker._eval):
+            nonlocal calls
+            calls += 1
+            return await original(*args)
+        worker._eval = counted
+
+    total = 0
+    for _ in range(requests):
+        for worker in workers:
+            total += await allowed(worker, 1)
+    return total, calls
+
+@pytest.mark.parametrize("local_batch", [5, 8])
+def test_local_batch_within_limit_allows_the_same_with_fewer_calls(clock, local_batch):
+    exact = asyncio.run(interleaved(fakeredis.FakeServer(), 0, LIMIT // 2))
+    batched = asyncio.run(interleaved(fakeredis.FakeServer(), local_batch, LIMIT // 2))
+
+    assert exact == (LIMIT, LIMIT)
+    assert batched[0] == LIMIT
+    assert batched[1] < exact[1]
+
+@pytest.mark.parametrize("local_batch", [1, 5, 8])
+def test_local_batch_over_limit_never_allows_more(clock, local_batch):
+    exact, _ = asyncio.run(interleaved(fakeredis.FakeServer(), 0, LIMIT))
+    batched, _ = asyncio.run(interleaved(fakeredis.FakeServer(), local_batch, LIMIT))
+
+    assert exact == LIMIT
+    # Tokens reserved by one process are not available to the other, so
+    # batching can allow fewer requests, by at most the unspent reservations
+    assert LIMIT - 2 * (local_batch - 1) <= batched <= exact